@@ -6,13 +6,12 @@ import time
 import importlib
 from datetime import datetime
 
-from tqdm import tqdm
-
-from setting import Config
+from setting import settings
 from log_msg import log_msg
-from unzipper import getPasswordList, move_files_up, unzipFileWith7z
-
-settings = Config.get_instance().settings
+from password_hints import PasswordHints
+from reclaim import Reclaimer
+from tracing import Tracer, run_profiled
+from unzipper import getPasswordList, list_target_files, map_jobs, move_files_up, parallel_jobs, unzipFileWith7z
 
 
 ################### MAIN FUNCTION ################################################################
@@ -28,6 +27,9 @@ def main(target):
     # get the password list
     passwords = getPasswordList(target)
 
+    # track the disk usage of the run to report its peak and final values
+    reclaimer = Reclaimer(target if os.path.isdir(target) else os.path.dirname(os.path.abspath(target)))
+
     #################################### prepare for unzipping #####################################
     # start timer
     start_time = time.time()
@@ -44,32 +46,54 @@ def main(target):
             for file in files:
                 total_files += 1
                 total_file_size += os.path.getsize(os.path.join(root, file))
+    # number of archives extracted at once, 0 means as many as the cpu count and the free space allow
+    workers = parallel_jobs(
+        target, list_target_files(target), settings["zip_excutible_path"], settings["max_parallel_jobs"]
+    )
+
     # convert to MB
     total_file_size = total_file_size / 1024 / 1024
 
     # display info
     print(f"Total files: {total_files}, total size: {total_file_size:.2f} MB")
 
+    # the progress bar is imported here, it takes most of the startup time otherwise
+    from tqdm import tqdm
+
+    # passwords found during the run are tried first on the nested and sibling archives
+    hints = PasswordHints()
+
+    def unzip_job(path):
+        """unzip one file, return None if the file no longer exists, otherwise its size in MB and the success flag"""
+        # it is possible that a part of the multi-part archive is deleted and no longer exists
+        # in this case, the file will be skipped
+        if not os.path.exists(path):
+            return None
+        size = os.path.getsize(path) / 1024 / 1024
+        success, lv = unzipFileWith7z(
+            path,
+            settings["zip_excutible_path"],
+            passwords=passwords,
+            autodelete=settings["autodelete"],
+            autodeleteexisting=settings["autodeleteexisting"],
+            hints=hints,
+            reclaimer=reclaimer,
+        )
+        return size, success
+
     ##################################### start unzipping ##########################################
     # if target is a directory
     if os.path.isdir(target):
         if settings["unzipsubfolder"]:
             # unzip all files including files under subfolders
             for root, dirs, files in os.walk(target):
-                for file in tqdm(files):
-                    # it is possible that a part of the multi-part archive is deleted and no longer exists
-                    # in this case, the file will be skipped
-                    if not os.path.exists(os.path.join(root, file)):
+                paths = [os.path.join(root, file) for file in files]
+                for file, result in zip(files, tqdm(map_jobs(unzip_job, paths, workers), total=len(paths))):
+                    if result is None:
                         log_msg(f"-- {file} does not exist (deleted after unzipping the main part).", log_level=5)
                         continue
-                    finished_files_size += os.path.getsize(os.path.join(root, file)) / 1024 / 1024
-                    success, lv = unzipFileWith7z(
-                        os.path.join(root, file),
-                        settings["zip_excutible_path"],
-                        passwords=passwords,
-                        autodelete=settings["autodelete"],
-                        autodeleteexisting=settings["autodeleteexisting"],
-                    )
+                    size, success = result
+                    finished_files_size += size
                     finished_files += 1
                     if success:
                         log_msg(
@@ -95,15 +119,13 @@ def main(target):
             # create a list of files (not directories)
             list_of_files = [file for file in list_of_files if os.path.isfile(os.path.join(target, file))]
 
-            for file in tqdm(list_of_files):
-                finished_files_size += os.path.getsize(os.path.join(target, file)) / 1024 / 1024
-                success, lv = unzipFileWith7z(
-                    os.path.join(target, file),
-                    settings["zip_excutible_path"],
-                    passwords=passwords,
-                    autodelete=settings["autodelete"],
-                    autodeleteexisting=settings["autodeleteexisting"],
-                )
+            paths = [os.path.join(target, file) for file in list_of_files]
+            for file, result in zip(list_of_files, tqdm(map_jobs(unzip_job, paths, workers), total=len(paths))):
+                if result is None:
+                    log_msg(f"-- {file} does not exist (deleted after unzipping the main part).", log_level=5)
+                    continue
+                size, success = result
+                finished_files_size += size
                 finished_files += 1
                 if success:
                     log_msg(
@@ -130,10 +152,17 @@ def main(target):
             passwords=passwords,
             autodelete=settings["autodelete"],
             autodeleteexisting=settings["autodeleteexisting"],
+            hints=hints,
+            reclaimer=reclaimer,
         )
         if settings["automoveup"]:
             move_files_up(target + "lv0")
 
+    reclaimer.report()
+
+    # write the timeline of the run if tracing is enabled
+    Tracer.get_instance().save()
+
 
 ################### MAIN FUNCTION ################################################################
 
@@ -141,7 +170,8 @@ if __name__ == "__main__":
     if len(sys.argv) > 1:
         # run the main function
         if os.path.exists(sys.argv[1]):
-            main(
+            run_profiled(
+                main,
                 sys.argv[1],
             )
 
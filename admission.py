@@ -0,0 +1,122 @@
+"""admission control, make sure an archive fits on the destination disk before starting to extract it"""
+
+import os
+import shutil
+import threading
+import time
+
+from log_msg import log_msg
+
+
+class AdmissionController:
+    """AdmissionController Singleton class, keeps track of the disk space reserved by the running extractions"""
+
+    _instance = None
+
+    @staticmethod
+    def get_instance():
+        """Get the instance of the singleton class"""
+        if AdmissionController._instance is None:
+            AdmissionController()
+        return AdmissionController._instance
+
+    def __init__(self):
+        if AdmissionController._instance is not None:
+            raise Exception("This class is a singleton!")
+        else:
+            AdmissionController._instance = self
+            self._condition = threading.Condition()
+            # reserved bytes per device, so that jobs on different disks do not block each other
+            self._reserved = {}
+
+    def free_space(self, dest):
+        """free bytes on the disk holding dest, minus the space reserved by the other running jobs"""
+        dest = _existing_parent(dest)
+        with self._condition:
+            reserved = self._reserved.get(_device(dest), 0)
+        return shutil.disk_usage(dest).free - reserved
+
+    def admit(self, dest, nbytes, margin=0, timeout=0):
+        """reserve nbytes on the disk holding dest, wait up to timeout seconds for other jobs to free their reservation,
+        return a Reservation if admitted, otherwise return None. The margin is kept free between the running jobs:
+        a job alone on the disk is admitted as soon as nbytes fit"""
+        dest = _existing_parent(dest)
+        device = _device(dest)
+        needed = nbytes + margin
+        deadline = time.monotonic() + timeout
+
+        with self._condition:
+            while True:
+                free = shutil.disk_usage(dest).free
+                reserved = self._reserved.get(device, 0)
+                if (needed if reserved else nbytes) <= free - reserved:
+                    self._reserved[device] = reserved + nbytes
+                    return Reservation(self, device, nbytes)
+                if nbytes > free:
+                    # would not fit even if every other job finished, no point in waiting
+                    log_msg(
+                        f"Not enough space in {dest}: {nbytes / 1024 / 1024:.2f} MB needed, {free / 1024 / 1024:.2f} MB free",
+                        log_level=5,
+                    )
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    log_msg(
+                        f"Timed out waiting for {needed / 1024 / 1024:.2f} MB in {dest} ({reserved / 1024 / 1024:.2f} MB reserved by other jobs)",
+                        log_level=5,
+                    )
+                    return None
+                log_msg(f"Waiting for other jobs to free space in {dest}...", log_level=2)
+                self._condition.wait(remaining)
+
+    def release(self, device, nbytes):
+        """give back a reservation, called by Reservation.release"""
+        with self._condition:
+            self._reserved[device] = max(self._reserved.get(device, 0) - nbytes, 0)
+            self._condition.notify_all()
+
+    def job_slots(self, dest, job_bytes, max_jobs=0):
+        """number of jobs that can run at once, limited by the cpu count (or max_jobs if > 0) and by how many
+        jobs of job_bytes fit in the free space of dest"""
+        slots = max_jobs if max_jobs > 0 else (os.cpu_count() or 1)
+        if job_bytes > 0:
+            slots = min(slots, self.free_space(dest) // job_bytes)
+        return max(int(slots), 1)
+
+
+class Reservation:
+    """a block of disk space held by one extraction, can be used as a context manager"""
+
+    def __init__(self, controller, device, nbytes):
+        self._controller = controller
+        self._device = device
+        self.nbytes = nbytes
+        self._released = False
+
+    def release(self):
+        """give the reserved space back, can be called several times"""
+        if not self._released:
+            self._released = True
+            self._controller.release(self._device, self.nbytes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+def _existing_parent(path):
+    """the closest existing directory of path, the output directory usually does not exist yet"""
+    path = os.path.abspath(path)
+    while not os.path.exists(path):
+        parent = os.path.dirname(path)
+        if parent == path:
+            break
+        path = parent
+    return path
+
+
+def _device(path):
+    """identifier of the disk holding path"""
+    return os.stat(path).st_dev
@@ -0,0 +1,137 @@
+"""library API of the extraction engine, for services that embed the unzipper instead of running the script
+
+    for event in extract(target, {"autodelete": False}):
+        ...
+
+    async for event in extract_async(target):
+        ...
+
+the events are the dataclasses of events.py, the last one is always RunFinished, unless the run fails: the exception
+is then raised by the iterator. Nothing is printed, the log lines are LogMessage events. Options override the settings
+of the same name for this call only (zip_excutible_path, autodelete, autodeleteexisting, automoveup, unzipsubfolder,
+max_parallel_jobs, include_filters, exclude_filters), the passwords option replaces the password files.
+"""
+
+import os
+import queue
+import threading
+import time
+
+from events import LogMessage, RunFinished
+from log_msg import log_handler
+from password_hints import PasswordHints
+from reclaim import Reclaimer
+from setting import settings
+from tracing import Tracer
+from unzipper import getPasswordList, list_target_files, map_jobs, move_files_up, parallel_jobs, unzipFileWith7z
+
+
+# marks the end of the event stream in the queue
+_end_of_run = object()
+
+
+class _RunFailed:
+    """exception of the background run, raised again by the iterator"""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def run(target, options=None, on_event=None):
+    """unzip target with the per-call options, report the events to on_event, return the RunFinished event
+    the log lines are reported as LogMessage events instead of being printed"""
+    token = log_handler.set(lambda message, level: on_event(LogMessage(message, level)) if on_event else None)
+    try:
+        return _run(target, options, on_event)
+    finally:
+        log_handler.reset(token)
+        # write the timeline of the run if tracing is enabled, a failed run too
+        Tracer.get_instance().save()
+
+
+def _run(target, options, on_event):
+    options = {**settings, **(options or {})}
+    passwords = options.get("passwords")
+    if passwords is None:
+        passwords = getPasswordList(target)
+    start_time = time.time()
+    reclaimer = Reclaimer(target if os.path.isdir(target) else os.path.dirname(os.path.abspath(target)))
+    hints = PasswordHints()
+
+    def unzip_job(path):
+        # a part of a multi-part archive may have been deleted with its principal part
+        if not os.path.exists(path):
+            return False
+        success, lv = unzipFileWith7z(
+            path,
+            options["zip_excutible_path"],
+            passwords=passwords,
+            autodelete=options["autodelete"],
+            autodeleteexisting=options["autodeleteexisting"],
+            on_event=on_event,
+            include_filters=options["include_filters"],
+            exclude_filters=options["exclude_filters"],
+            hints=hints,
+            reclaimer=reclaimer,
+        )
+        if options["automoveup"] and os.path.isdir(path + "lv0"):
+            move_files_up(path + "lv0")
+        return success
+
+    files = list_target_files(target, options["unzipsubfolder"])
+    workers = parallel_jobs(target, files, options["zip_excutible_path"], options["max_parallel_jobs"])
+    results = list(map_jobs(unzip_job, files, workers))
+    peak_bytes, final_bytes = reclaimer.report()
+    finished = RunFinished(
+        target, results.count(True), results.count(False), time.time() - start_time, peak_bytes, final_bytes
+    )
+    if on_event is not None:
+        on_event(finished)
+    return finished
+
+
+def _start_run(target, options):
+    """run in a background thread, return the queue of its events, ended by _end_of_run"""
+    events = queue.Queue()
+
+    def worker():
+        try:
+            run(target, options, events.put)
+        except BaseException as e:
+            events.put(_RunFailed(e))
+        finally:
+            events.put(_end_of_run)
+
+    threading.Thread(target=worker, daemon=True).start()
+    return events
+
+
+def _next_event(event):
+    """raise the exception of a failed run"""
+    if isinstance(event, _RunFailed):
+        raise event.error
+    return event
+
+
+def extract(target, options=None):
+    """unzip target, yield the events as they happen, the extraction runs in a background thread"""
+    events = _start_run(target, options)
+    while True:
+        event = _next_event(events.get())
+        if event is _end_of_run:
+            return
+        yield event
+
+
+async def extract_async(target, options=None):
+    """asynchronous version of extract, the event loop is not blocked while waiting for the next event"""
+    # asyncio is slow to import, the synchronous API does not need it
+    import asyncio
+
+    loop = asyncio.get_running_loop()
+    events = _start_run(target, options)
+    while True:
+        event = _next_event(await loop.run_in_executor(None, events.get))
+        if event is _end_of_run:
+            return
+        yield event
@@ -0,0 +1,245 @@
+"""read the table of contents of an archive without extracting it, used to make decisions before writing anything to disk"""
+
+import fnmatch
+import hashlib
+import heapq
+import os
+import re
+import subprocess
+
+from output_decode import is_not_archive, is_wrong_password
+from setting import settings
+
+# magic bytes of the formats the extractor is expected to open, (offset, signature, format)
+signatures = [
+    (0, b"PK\x03\x04", "zip"),
+    (0, b"PK\x05\x06", "zip"),
+    (0, b"PK\x07\x08", "zip"),
+    (0, b"Rar!\x1a\x07", "rar"),
+    (0, b"7z\xbc\xaf\x27\x1c", "7z"),
+    (0, b"\x1f\x8b", "gzip"),
+    (0, b"\xfd7zXZ\x00", "xz"),
+    (0, b"BZh", "bzip2"),
+    (0, b"\x28\xb5\x2f\xfd", "zstd"),
+    (0, b"MSCF", "cab"),
+    (0, b"MSWIM", "wim"),
+    (0, b"xar!", "xar"),
+    (0, b"\x60\xea", "arj"),
+    (2, b"-lh", "lzh"),
+    (257, b"ustar", "tar"),
+    (0x8001, b"CD001", "iso"),
+]
+
+# bytes read at the start and at the end of a file to fingerprint it
+fingerprint_chunk_size = 64 * 1024
+
+# names of entries that are archives themselves, including the first part of multi-part archives
+archive_name_regex = r"\.(?:zip|rar|7z|tar|gz|tgz|xz|txz|bz2|tbz2?|zst|tzst|cab|iso|wim|lzh|arj|001)$"
+
+# the same names as 7z wildcards, always extracted when filters are used so that the recursion still works,
+# the multi-part volumes are included too (.r00, .z01, .002...)
+archive_wildcards = [
+    "*.zip",
+    "*.rar",
+    "*.7z",
+    "*.tar",
+    "*.gz",
+    "*.tgz",
+    "*.xz",
+    "*.txz",
+    "*.bz2",
+    "*.tbz",
+    "*.tbz2",
+    "*.zst",
+    "*.tzst",
+    "*.cab",
+    "*.iso",
+    "*.wim",
+    "*.lzh",
+    "*.arj",
+    "*.r??",
+    "*.z??",
+    "*.0??",
+]
+
+
+class ArchiveListing:
+    """the parsed result of a technical listing (7z l -slt) of an archive"""
+
+    def __init__(self, archive_type=None, solid=False, entries=None):
+        self.archive_type = archive_type
+        self.solid = solid
+        # each entry is a dict with the keys "path", "size", "packed_size", "is_dir" and "encrypted"
+        self.entries = entries if entries is not None else []
+
+    @property
+    def uncompressed_size(self):
+        """total size of all files in the archive once extracted, in bytes"""
+        return sum(entry["size"] for entry in self.entries if not entry["is_dir"])
+
+    def filtered_size(self, include=None, exclude=None):
+        """size of the files that are extracted with the include / exclude filters, in bytes"""
+        return sum(
+            entry["size"]
+            for entry in self.entries
+            if not entry["is_dir"] and matches_filters(entry["path"], include, exclude)
+        )
+
+    def shards(self, count, include=None, exclude=None):
+        """split the files selected by the filters into at most count shards of about the same uncompressed size
+        (the biggest files first, each one to the lightest shard), return the non-empty shards as lists of entries"""
+        files = [
+            entry for entry in self.entries if not entry["is_dir"] and matches_filters(entry["path"], include, exclude)
+        ]
+        shards = [[] for _ in range(count)]
+        # (bytes in the shard, index of the shard)
+        heap = [(0, index) for index in range(count)]
+        for entry in sorted(files, key=lambda entry: entry["size"], reverse=True):
+            size, index = heapq.heappop(heap)
+            shards[index].append(entry)
+            heapq.heappush(heap, (size + entry["size"], index))
+        return [shard for shard in shards if shard]
+
+    @property
+    def encrypted(self):
+        """True if at least one entry of the archive is encrypted"""
+        return any(entry["encrypted"] for entry in self.entries)
+
+
+def list_archive(file, z7path, password=None):
+    """list the content of an archive with 7z, return an ArchiveListing, or None if the archive cannot be listed"""
+    listing, status = probe_archive(file, z7path, password)
+    return listing
+
+
+def probe_archive(file, z7path, password=None):
+    """list the content of an archive with 7z, return the ArchiveListing (or None) and a status among
+    "ok", "encrypted" (headers encrypted, wrong password), "not_archive" and "error"
+    the listings made without password are kept in the metadata cache (metadata_cache setting)
+    """
+    if password is None and settings["metadata_cache"]:
+        # metadata_cache imports this module
+        from metadata_cache import MetadataCache
+
+        cache = MetadataCache.get_instance()
+        cached, fingerprint = cache.lookup(file)
+        if cached is not None:
+            return cached
+        listing, status = run_lister(file, z7path)
+        # the fingerprint computed by the lookup is not read again
+        cache.store(file, listing, status, fingerprint)
+        return listing, status
+    return run_lister(file, z7path, password)
+
+
+def run_lister(file, z7path, password=None):
+    """list the content of an archive with 7z, return the ArchiveListing (or None) and its status, see probe_archive"""
+    # without a password, archives with encrypted headers fail like the first extraction attempt of unzipFileWith7z
+    args = [z7path, "l", "-slt", file] if password is None else [z7path, "l", "-slt", f"-p{password}", file]
+    try:
+        result = subprocess.run(
+            args,
+            capture_output=True,
+            stdin=subprocess.DEVNULL,
+            check=False,
+        )
+    except OSError:
+        return None, "error"
+    if is_wrong_password(result):
+        return None, "encrypted"
+    if is_not_archive(result):
+        return None, "not_archive"
+    if result.returncode != 0:
+        return None, "error"
+    listing = parse_listing(result.stdout.decode("utf-8", errors="replace"))
+    # an extractor that does not speak the 7z syntax (Bandizip) gives an output that cannot be parsed
+    return listing, "ok" if listing is not None else "error"
+
+
+def sniff_signature(file):
+    """read the magic bytes of file, return the format name or None if the file does not look like an archive"""
+    try:
+        with open(file, "rb") as f:
+            head = f.read(0x8001 + 5)
+    except OSError:
+        return None
+    for offset, signature, format_name in signatures:
+        if head[offset : offset + len(signature)] == signature:
+            return format_name
+    return None
+
+
+def archive_fingerprint(file):
+    """identify the content of a file without reading all of it: size plus a hash of its first and last 64 KiB,
+    it survives renames and moves and changes when the archive is rewritten"""
+    size = os.path.getsize(file)
+    digest = hashlib.sha1(str(size).encode("ascii"))
+    with open(file, "rb") as f:
+        digest.update(f.read(fingerprint_chunk_size))
+        if size > 2 * fingerprint_chunk_size:
+            f.seek(-fingerprint_chunk_size, os.SEEK_END)
+            digest.update(f.read(fingerprint_chunk_size))
+    return f"{size:d}-{digest.hexdigest()}"
+
+
+def is_archive_name(name):
+    """True if the name of a file (or archive entry) looks like an archive"""
+    return re.search(archive_name_regex, name, flags=re.IGNORECASE) is not None
+
+
+def matches_filters(path, include=None, exclude=None):
+    """True if the file at path (inside an archive) is extracted with the include / exclude glob filters, applied to
+    the file name like 7z does: excluded names never are, archives always are so that the recursion goes on"""
+    name = os.path.basename(path.replace("\\", "/"))
+    if exclude and any(fnmatch.fnmatch(name, pattern) for pattern in exclude):
+        return False
+    if not include or any(fnmatch.fnmatch(name, pattern) for pattern in archive_wildcards):
+        return True
+    return any(fnmatch.fnmatch(name, pattern) for pattern in include)
+
+
+def parse_listing(output):
+    """parse the output of 7z l -slt, return an ArchiveListing, or None if the output is not a technical listing"""
+    # the archive properties are separated from the entries by a line of dashes
+    header, sep, body = output.partition("\n----------")
+    if not sep:
+        return None
+
+    archive_props = _parse_block(header.rpartition("\n--")[2])
+    listing = ArchiveListing(
+        archive_type=archive_props.get("Type"),
+        solid=archive_props.get("Solid") == "+",
+    )
+
+    for block in body.split("\n\n"):
+        props = _parse_block(block)
+        if "Path" not in props:
+            continue
+        listing.entries.append(
+            {
+                "path": props["Path"],
+                "size": _to_int(props.get("Size")),
+                "packed_size": _to_int(props.get("Packed Size")),
+                "is_dir": props.get("Folder") == "+" or props.get("Attributes", "").startswith("D"),
+                "encrypted": props.get("Encrypted") == "+",
+            }
+        )
+    return listing
+
+
+def _parse_block(block):
+    """parse a block of "key = value" lines into a dict"""
+    props = {}
+    for line in block.splitlines():
+        key, sep, value = line.partition(" = ")
+        if sep:
+            props[key.strip()] = value.strip()
+    return props
+
+
+def _to_int(value):
+    """convert a size field to int, missing or empty fields count as 0"""
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
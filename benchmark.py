@@ -0,0 +1,244 @@
+"""micro-benchmarks of the directory-heavy helpers on synthetic trees and outputs of 1k, 10k and 100k files
+
+each helper is timed at every scale, the growth between the smallest and the biggest scale gives its complexity
+(1 = linear, 2 = quadratic), and the timings are compared to the baselines stored by a previous run. The exit code
+is 1 if a helper became super-linear or much slower than its baseline, so it can be used as a local regression gate:
+
+    python benchmark.py                     # compare with the baselines
+    python benchmark.py --update-baseline   # store the current timings as the baselines
+    python benchmark.py --scales 1000 10000 # quicker run
+
+the startup is checked too: importing the entry points in a fresh interpreter must fit in the import budget, load none
+of the lazy modules and create no file (the settings are only read when first used).
+"""
+
+import json
+import math
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from last_level import check_if_is_last_level
+from output_decode import is_not_archive, is_wrong_password
+from unzipper import archive_parts, getPassInFileName, move_files_up
+
+# the baselines are stored in the users home directory, they only make sense on the machine that measured them
+baseline_file_name = ".MultiLevelUnzipperBench.json"
+
+default_scales = [1000, 10000, 100000]
+
+# log-log slope above which a helper is reported as super-linear
+max_slope = 1.3
+# a helper is reported as slower than its baseline above baseline * tolerance + slack seconds
+tolerance = 2.0
+slack = 0.005
+repeats = 3
+
+# modules imported by the entry points, they are checked with python -X importtime
+entry_points = ["MultilevelUnzipper", "api"]
+# seconds
+import_budget = 0.1
+# slow modules that must only be imported when they are used
+lazy_modules = ["tqdm", "send2trash", "mimetypes", "asyncio", "cProfile", "concurrent.futures", "sqlite3"]
+
+
+def make_flat_tree(dir_path, n):
+    """n empty files directly under dir_path, plus the archive whose parts are looked for"""
+    os.makedirs(dir_path, exist_ok=True)
+    for i in range(n):
+        open(os.path.join(dir_path, f"file_{i:06d}.dat"), "w").close()
+    open(os.path.join(dir_path, "bundle.part1.rar"), "w").close()
+
+
+def make_nested_tree(dir_path, n, files_per_dir=100):
+    """n empty files (no program, image or video) spread over subdirectories of dir_path"""
+    for i in range(n):
+        sub_dir = os.path.join(dir_path, f"dir_{i // files_per_dir:05d}")
+        if i % files_per_dir == 0:
+            os.makedirs(sub_dir, exist_ok=True)
+        open(os.path.join(sub_dir, f"file_{i:06d}.dat"), "w").close()
+
+
+def make_single_subdir_tree(dir_path, n):
+    """dir_path containing a single directory of n files, the case flattened by move_files_up"""
+    make_flat_tree(os.path.join(dir_path, "only_child"), n)
+
+
+def make_output(n):
+    """a CompletedProcess as big as the output of the extractor for an archive of n files"""
+    lines = "".join(f"- extracting folder/file_{i:06d}.dat\n" for i in range(n)).encode("utf8")
+    return subprocess.CompletedProcess(["7z"], 2, stdout=lines, stderr=lines + b"ERROR: Wrong password")
+
+
+def bench_archive_parts(work_dir, n):
+    """remove_archive without the recycle bin: listdir plus the part regexes"""
+    make_flat_tree(work_dir, n)
+    start = time.perf_counter()
+    archive_parts(os.path.join(work_dir, "bundle.part1.rar"))
+    return time.perf_counter() - start
+
+
+def bench_move_files_up(work_dir, n):
+    """move n files up by one level"""
+    make_single_subdir_tree(work_dir, n)
+    start = time.perf_counter()
+    move_files_up(work_dir)
+    return time.perf_counter() - start
+
+
+def bench_check_if_is_last_level(work_dir, n):
+    """classify a directory of n files, all criteria fail so every walk is complete"""
+    make_nested_tree(work_dir, n)
+    start = time.perf_counter()
+    check_if_is_last_level(work_dir)
+    return time.perf_counter() - start
+
+
+def bench_get_pass_in_file_name(work_dir, n):
+    """passwords contained in n file names"""
+    names = [f"bundle_{i:06d}_part_of_the_set_pass_{i:06d}.rar" for i in range(n)]
+    start = time.perf_counter()
+    for name in names:
+        getPassInFileName(name)
+    return time.perf_counter() - start
+
+
+def bench_output_decode(work_dir, n):
+    """decode the output of an extraction of n files (about 40 bytes per file)"""
+    result = make_output(n)
+    start = time.perf_counter()
+    is_not_archive(result)
+    is_wrong_password(result)
+    return time.perf_counter() - start
+
+
+benchmarks = {
+    "remove_archive": bench_archive_parts,
+    "move_files_up": bench_move_files_up,
+    "check_if_is_last_level": bench_check_if_is_last_level,
+    "getPassInFileName": bench_get_pass_in_file_name,
+    "output_decode": bench_output_decode,
+}
+
+
+def run_benchmarks(scales):
+    """time every helper at every scale (best of repeats runs, each on a fresh tree), return {name: {scale: seconds}}"""
+    timings = {}
+    for name, bench in benchmarks.items():
+        timings[name] = {}
+        for n in scales:
+            best = math.inf
+            for _ in range(repeats):
+                work_dir = tempfile.mkdtemp(prefix="mlu_bench_")
+                try:
+                    best = min(best, bench(work_dir, n))
+                finally:
+                    shutil.rmtree(work_dir, ignore_errors=True)
+            timings[name][str(n)] = best
+            print(f"{name:>24} {n:>8d} files: {best * 1000:10.2f} ms")
+    return timings
+
+
+def measure_startup(module):
+    """import module in a fresh interpreter with an empty home directory, return the import time in seconds, the
+    lazy modules it loaded and the files it created"""
+    home = tempfile.mkdtemp(prefix="mlu_home_")
+    try:
+        code = f"import sys, {module}; print(','.join(m for m in {lazy_modules!r} if m in sys.modules))"
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", code],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            env={**os.environ, "HOME": home, "USERPROFILE": home},
+        )
+        created = os.listdir(home)
+    finally:
+        shutil.rmtree(home, ignore_errors=True)
+    seconds = 0.0
+    # import time: self [us] | cumulative [us] | module
+    for line in result.stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            seconds = int(fields[1]) / 1e6
+    loaded = [name for name in result.stdout.strip().split(",") if name]
+    return seconds, loaded, created
+
+
+def check_startup():
+    """return the list of startup regressions: slow, eager or side-effecting imports of the entry points"""
+    regressions = []
+    for module in entry_points:
+        runs = [measure_startup(module) for _ in range(repeats)]
+        seconds = min(run[0] for run in runs)
+        loaded, created = runs[-1][1:]
+        print(f"{'import ' + module:>24}         : {seconds * 1000:10.2f} ms")
+        if seconds > import_budget:
+            regressions.append(f"importing {module} takes {seconds * 1000:.2f} ms (budget {import_budget * 1000:.0f} ms)")
+        if loaded:
+            regressions.append(f"importing {module} loads {', '.join(loaded)}")
+        if created:
+            regressions.append(f"importing {module} creates {', '.join(created)} in the home directory")
+    return regressions
+
+
+def slope(timing):
+    """growth exponent between the smallest and the biggest scale, time ~ n ** slope"""
+    scales = sorted(int(n) for n in timing)
+    small, big = scales[0], scales[-1]
+    if big == small or timing[str(small)] <= 0:
+        return 0.0
+    # the smallest timings are dominated by constant costs, they are floored to keep the slope meaningful
+    return math.log(max(timing[str(big)], 1e-6) / max(timing[str(small)], 1e-6)) / math.log(big / small)
+
+
+def check_regressions(timings, baselines):
+    """return the list of regressions: super-linear helpers and helpers slower than their baseline"""
+    regressions = []
+    for name, timing in timings.items():
+        growth = slope(timing)
+        if growth > max_slope:
+            regressions.append(f"{name} grows as n^{growth:.2f} (limit n^{max_slope})")
+        for n, seconds in timing.items():
+            baseline = baselines.get(name, {}).get(n)
+            if baseline is not None and seconds > baseline * tolerance + slack:
+                regressions.append(f"{name} at {n} files: {seconds * 1000:.2f} ms, baseline {baseline * 1000:.2f} ms")
+    return regressions
+
+
+def main(args):
+    """run the benchmarks, compare with or update the baselines, return the exit code"""
+    scales = default_scales
+    if "--scales" in args:
+        scales = [int(n) for n in args[args.index("--scales") + 1 :] if n.isdigit()]
+    baseline_file = os.path.join(os.path.expanduser("~"), baseline_file_name)
+
+    timings = run_benchmarks(scales)
+    for name, timing in timings.items():
+        print(f"{name:>24} complexity: n^{slope(timing):.2f}")
+
+    if "--update-baseline" in args:
+        with open(baseline_file, "w", encoding="utf8") as f:
+            json.dump(timings, f, indent=4)
+        print(f"Baselines written to {baseline_file}")
+        return 0
+
+    baselines = {}
+    if os.path.exists(baseline_file):
+        with open(baseline_file, "r", encoding="utf8") as f:
+            baselines = json.load(f)
+    else:
+        print(f"No baselines in {baseline_file}, only the complexity is checked")
+
+    regressions = check_regressions(timings, baselines) + check_startup()
+    for regression in regressions:
+        print(f"REGRESSION: {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,64 @@
+"""typed events reported by the extraction engine to the callers of the library API (see api.py)"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class ArchiveStarted:
+    """a file passed the checks and is handed to the extractor"""
+
+    path: str
+    level: int
+
+
+@dataclass
+class PasswordFound:
+    """the password of an archive has been found, source is "parent", "sibling", "file_name" or "list" """
+
+    path: str
+    level: int
+    password: str
+    source: str
+
+
+@dataclass
+class ArchiveFinished:
+    """the extraction of an archive is over, reason is "ok", "not_archive", "no_password", "no_space" or "error" """
+
+    path: str
+    level: int
+    success: bool
+    reason: str
+    output_dir: Optional[str] = None
+    bytes: Optional[int] = None
+
+
+@dataclass
+class LevelReached:
+    """an archive has been extracted to output_dir, last_level tells if the content is final or is unzipped again"""
+
+    path: str
+    level: int
+    output_dir: str
+    last_level: bool
+
+
+@dataclass
+class LogMessage:
+    """a line of the log (at or above the log_level setting), reported instead of printed by the library API"""
+
+    message: str
+    level: int
+
+
+@dataclass
+class RunFinished:
+    """all the archives of the target have been handled, with the peak and final disk usage of the run"""
+
+    target: str
+    succeeded: int
+    failed: int
+    seconds: float
+    peak_bytes: Optional[int] = None
+    final_bytes: Optional[int] = None
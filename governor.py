@@ -0,0 +1,148 @@
+"""resource governor for the extractor children: a global thread budget shared by the running extractions, and
+lower cpu / io priority so that a background run does not starve the other services of the host"""
+
+import os
+import shutil
+import subprocess
+import threading
+from contextlib import contextmanager
+
+from setting import settings
+from log_msg import log_msg
+from output_decode import is_bandizip
+
+
+# Windows priority classes, used instead of nice when the children are started
+below_normal_priority_class = 0x00004000
+idle_priority_class = 0x00000040
+
+# ionice classes by name, see man ionice
+ionice_classes = {"realtime": "1", "best-effort": "2", "idle": "3"}
+
+
+class ResourceGovernor:
+    """ResourceGovernor Singleton class, hands out extractor threads from the thread budget"""
+
+    _instance = None
+
+    @staticmethod
+    def get_instance():
+        """Get the instance of the singleton class"""
+        if ResourceGovernor._instance is None:
+            ResourceGovernor()
+        return ResourceGovernor._instance
+
+    def __init__(self):
+        if ResourceGovernor._instance is not None:
+            raise Exception("This class is a singleton!")
+        else:
+            ResourceGovernor._instance = self
+            self._condition = threading.Condition()
+            self.budget = settings["thread_budget"] or os.cpu_count() or 1
+            self.in_use = 0
+            # number of extractions expected to run at once, each of them gets an equal share of the budget
+            self.jobs = 1
+            self._budget_file_mtime = None
+
+    def set_budget(self, budget):
+        """change the thread budget, running extractions keep their threads, the next ones get the new share"""
+        with self._condition:
+            self.budget = max(int(budget), 1)
+            self._condition.notify_all()
+        log_msg(f"Thread budget set to {self.budget:d}", log_level=3)
+
+    def set_jobs(self, jobs):
+        """number of extractions running at once, used to split the budget"""
+        with self._condition:
+            self.jobs = max(int(jobs), 1)
+
+    def _reload_budget_file(self):
+        """read the budget from the thread_budget_file setting if the file changed, this is how the budget of a
+        running instance is adjusted (echo 4 > budget.txt)"""
+        budget_file = settings["thread_budget_file"]
+        if not budget_file:
+            return
+        try:
+            mtime = os.path.getmtime(budget_file)
+            if mtime == self._budget_file_mtime:
+                return
+            self._budget_file_mtime = mtime
+            with open(budget_file, "r", encoding="utf8") as f:
+                budget = int(f.read().strip())
+        except (OSError, ValueError):
+            return
+        if budget != self.budget:
+            self.set_budget(budget)
+
+    def acquire(self, parts=1):
+        """wait for at least one free thread of the budget, return the number of threads granted, parts is the
+        number of extractors sharing the share of one job (an archive extracted in shards)"""
+        self._reload_budget_file()
+        with self._condition:
+            while self.budget - self.in_use < 1:
+                self._condition.wait(1)
+            share = max(self.budget // (self.jobs * parts), 1)
+            granted = min(share, self.budget - self.in_use)
+            self.in_use += granted
+            return granted
+
+    def release(self, threads):
+        """give threads back to the budget"""
+        with self._condition:
+            self.in_use -= threads
+            self._condition.notify_all()
+
+    @contextmanager
+    def threads(self, parts=1):
+        """threads granted to one extractor run, as a context manager"""
+        granted = self.acquire(parts)
+        try:
+            yield granted
+        finally:
+            self.release(granted)
+
+
+def supports_thread_switch(z7path):
+    """7z accepts -mmt, Bandizip does not"""
+    return not is_bandizip(z7path)
+
+
+def priority_prefix():
+    """command prefix applying the child_nice and child_ionice_class settings on POSIX systems"""
+    prefix = []
+    if os.name == "nt":
+        return prefix
+    if settings["child_nice"] and shutil.which("nice"):
+        prefix += ["nice", "-n", str(settings["child_nice"])]
+    io_class = ionice_classes.get(settings["child_ionice_class"])
+    if io_class and shutil.which("ionice"):
+        prefix += ["ionice", "-c", io_class]
+    return prefix
+
+
+def priority_creationflags():
+    """Windows has no nice, the children are started in a lower priority class instead"""
+    if os.name != "nt" or not settings["child_nice"]:
+        return 0
+    if settings["child_nice"] >= 19 or settings["child_ionice_class"] == "idle":
+        return idle_priority_class
+    return below_normal_priority_class
+
+
+def governed_args(args, threads):
+    """insert the thread count after the 7z command (x, t, ...) and the priority prefix in front of args"""
+    if threads and supports_thread_switch(args[0]):
+        args = args[:2] + [f"-mmt{threads:d}"] + args[2:]
+    return priority_prefix() + args
+
+
+def run_governed(args, parts=1):
+    """run the extractor within the thread budget and at the configured priority, return the CompletedProcess"""
+    with ResourceGovernor.get_instance().threads(parts) as threads:
+        return subprocess.run(
+            governed_args(args, threads),
+            capture_output=True,
+            stdin=subprocess.DEVNULL,
+            check=False,
+            creationflags=priority_creationflags(),
+        )
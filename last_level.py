@@ -1,11 +1,7 @@
 """ This module contains functions used to check if a directory is the last level of a zip file """
-import mimetypes
 import os
-from setting import Config
 from log_msg import log_msg
 
-settings = Config.get_instance().settings
-
 
 def check_if_is_program(dir_):
     """check if the directory is a program directory, return True if yes, otherwise return False"""
@@ -61,6 +57,9 @@ def check_if_is_video_or_video_collection(dir_):
     """check if the directory is a video or video collection directory, return True if yes, otherwise return False"""
     # sometimes there is only one video
     # checking of the file can only be done with the file extension
+    # mimetypes reads the system type maps, it is only imported when a directory is classified
+    import mimetypes
+
     has_video_file = False
     for root, dirs, files in os.walk(dir_):
         for file_ in files:
@@ -81,3 +80,31 @@ def check_if_is_last_level(dir_):
     if check_if_is_video_or_video_collection(dir_):
         return True
     return False
+
+
+def check_if_listing_is_last_level(paths):
+    """same criteria as check_if_is_last_level, applied to the entry paths of an archive listing instead of a directory
+    that has been extracted, used to project the decisions before extracting anything"""
+    names = [os.path.basename(path) for path in paths]
+    extensions = [os.path.splitext(name)[1].lower() for name in names]
+
+    # program: .exe together with .dll files or with folders at the top level
+    contains_exe = ".exe" in extensions
+    contains_dll = ".dll" in extensions
+    contains_folder = any("/" in path.replace("\\", "/").strip("/") for path in paths)
+    if contains_exe and (contains_folder or contains_dll):
+        return True
+
+    # image collection: more than 2 images
+    image_extensions = [".jpg", ".jpeg", ".png", ".bmp", ".gif", ".tiff", ".tif"]
+    if sum(1 for extension in extensions if extension in image_extensions) > 2:
+        return True
+
+    # video or video collection
+    import mimetypes
+
+    for name in names:
+        mimetype, encoding = mimetypes.guess_type(name)
+        if mimetype and mimetype.startswith("video"):
+            return True
+    return False
@@ -0,0 +1,314 @@
+"""coordinated extraction of one tree by several workers (processes on one host or on many hosts sharing the
+filesystem), archives are claimed through lease files so that no two workers unzip or delete the same archive
+
+the ledger is a directory under the target:
+    .mlu_ledger/leases/<key>.json   archive currently claimed by a worker, until "expires"
+    .mlu_ledger/done/<key>.json     archive finished, written atomically with os.replace
+leases rely on the clocks of the hosts being roughly in sync (NTP)
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import shutil
+import socket
+import sys
+import threading
+import time
+
+from setting import settings
+from log_msg import log_msg
+from password_hints import PasswordHints
+from reclaim import Reclaimer
+from tracing import Tracer
+from unzipper import getPasswordList, move_files_up, unzipFileWith7z
+
+
+ledger_dir_name = ".mlu_ledger"
+
+# output directories of the unzipper ({file}lv{N}), they are created by the workers and are not jobs themselves
+output_dir_regex = r"lv\d+$"
+
+
+class LeaseLost(Exception):
+    """the lease of the job has been taken over by another worker, which now extracts the archive"""
+
+
+class JobLedger:
+    """lease based job ledger stored on the shared filesystem"""
+
+    def __init__(self, target, worker_id=None, lease_seconds=None):
+        self.target = os.path.abspath(target)
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds or settings["ledger_lease_seconds"]
+        self.lease_dir = os.path.join(self.target, ledger_dir_name, "leases")
+        self.done_dir = os.path.join(self.target, ledger_dir_name, "done")
+        # jobs claimed from a crashed worker, their output may be partial
+        self._taken_over = set()
+        os.makedirs(self.lease_dir, exist_ok=True)
+        os.makedirs(self.done_dir, exist_ok=True)
+
+    def _key(self, path):
+        """file name of the records of path, the relative path is hashed so that it is valid on every filesystem"""
+        rel_path = os.path.relpath(os.path.abspath(path), self.target).replace(os.sep, "/")
+        return hashlib.sha1(rel_path.encode("utf8")).hexdigest() + ".json"
+
+    def _record(self, path, **fields):
+        """content of a lease or done record"""
+        return json.dumps({"worker": self.worker_id, "path": os.path.relpath(path, self.target), **fields})
+
+    def is_done(self, path):
+        """True if some worker already finished path"""
+        return os.path.exists(os.path.join(self.done_dir, self._key(path)))
+
+    def claim(self, path):
+        """try to take the lease of path, return True if this worker now owns it"""
+        if self.is_done(path):
+            return False
+        lease_file = os.path.join(self.lease_dir, self._key(path))
+        if not self._create_lease(lease_file, path):
+            if not self._take_expired_lease(lease_file, path):
+                return False
+        # the job may have been completed between the first check and the creation of the lease
+        if self.is_done(path):
+            self._release(lease_file)
+            self._taken_over.discard(path)
+            return False
+        return True
+
+    def was_taken_over(self, path):
+        """True if the lease of path was claimed from a crashed worker, which may have left a partial output"""
+        return path in self._taken_over
+
+    def _take_expired_lease(self, lease_file, path):
+        """replace the lease of a crashed owner by a lease of this worker, return True on success"""
+        expired = self._read_lease(lease_file)
+        if expired is None or not self._is_expired(lease_file, expired):
+            return False
+        if not self._replace_lease(lease_file, expired, path):
+            return False
+        log_msg(f"Reclaimed expired lease of {path}", log_level=3)
+        self._taken_over.add(path)
+        return True
+
+    def _replace_lease(self, lease_file, expected, path):
+        """replace the lease file, whose content was expected when read, by a new lease of this worker, return False
+        if another worker changed it in the meantime (its lease is then left in place)"""
+        # only one worker can rename the lease away, the others get an error
+        stale_file = f"{lease_file}.stale-{self.worker_id}"
+        try:
+            os.rename(lease_file, stale_file)
+        except OSError:
+            return False
+        taken = self._read_lease(stale_file)
+        os.remove(stale_file)
+        if taken != expected:
+            # another worker replaced the lease between the read and the rename, its lease is put back
+            if taken is not None:
+                self._create_file(lease_file, taken)
+            return False
+        return self._create_lease(lease_file, path)
+
+    def _create_lease(self, lease_file, path):
+        """create the lease file if it does not exist yet (atomic on local filesystems and NFSv3+/SMB)"""
+        return self._create_file(lease_file, self._record(path, expires=time.time() + self.lease_seconds))
+
+    def _create_file(self, file, content):
+        """create file with content if it does not exist yet, return False if it exists"""
+        try:
+            fd = os.open(file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf8") as f:
+            f.write(content)
+        return True
+
+    def _read_lease(self, lease_file):
+        """content of the lease file, None if there is none"""
+        try:
+            with open(lease_file, "r", encoding="utf8") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _is_expired(self, lease_file, content):
+        """True if the lease (content of lease_file) has not been renewed in time"""
+        try:
+            return json.loads(content)["expires"] < time.time()
+        except (ValueError, KeyError):
+            # lease being written by its owner, or left half written by a crash
+            try:
+                return os.path.getmtime(lease_file) + self.lease_seconds < time.time()
+            except FileNotFoundError:
+                return False
+
+    def owns(self, path):
+        """True if this worker holds the lease of path"""
+        return self._is_own(self._read_lease(os.path.join(self.lease_dir, self._key(path))))
+
+    def _is_own(self, content):
+        """True if content is a lease of this worker"""
+        try:
+            return content is not None and json.loads(content)["worker"] == self.worker_id
+        except (ValueError, KeyError):
+            return False
+
+    def renew(self, path):
+        """extend the lease of path, return False if the lease has been lost to another worker"""
+        lease_file = os.path.join(self.lease_dir, self._key(path))
+        content = self._read_lease(lease_file)
+        if not self._is_own(content):
+            return False
+        # the lease is swapped rather than overwritten, another worker may take it over between the read and the write
+        return self._replace_lease(lease_file, content, path)
+
+    def complete(self, path, success):
+        """record that path is finished and give the lease back, return False (and record nothing) if the lease
+        has been lost to another worker"""
+        if not self.owns(path):
+            return False
+        done_file = os.path.join(self.done_dir, self._key(path))
+        self._write_atomic(done_file, self._record(path, success=success, finished=time.time()))
+        self._release(os.path.join(self.lease_dir, self._key(path)))
+        return True
+
+    def _release(self, lease_file):
+        """remove the lease file"""
+        try:
+            os.remove(lease_file)
+        except FileNotFoundError:
+            pass
+
+    def _write_atomic(self, file, content):
+        """write to a temporary file then move it over file, readers never see a partial record"""
+        tmp_file = f"{file}.tmp-{self.worker_id}"
+        with open(tmp_file, "w", encoding="utf8") as f:
+            f.write(content)
+        os.replace(tmp_file, file)
+
+
+class LeaseHeartbeat:
+    """renew the lease of a job in the background while it is being extracted, check_lease is given as the on_event
+    callback of the extraction so that the job stops at the next archive once the lease is lost"""
+
+    def __init__(self, ledger, path):
+        self._ledger = ledger
+        self._path = path
+        self._stop = threading.Event()
+        self.lost = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self._ledger.lease_seconds / 3):
+            if not self._ledger.renew(self._path):
+                log_msg(f"Lease of {self._path} lost to another worker", log_level=5)
+                self.lost.set()
+                return
+
+    def check_lease(self, event=None):
+        """raise LeaseLost if another worker took the job over"""
+        if self.lost.is_set():
+            raise LeaseLost(self._path)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._stop.set()
+        self._thread.join()
+
+
+def list_jobs(target):
+    """archives of target that workers can claim, in a stable order shared by all workers"""
+    if not settings["unzipsubfolder"]:
+        return sorted(
+            os.path.join(target, file) for file in os.listdir(target) if os.path.isfile(os.path.join(target, file))
+        )
+    jobs = []
+    for root, dirs, files in os.walk(target):
+        # skip the ledger and the directories unzipped by other workers
+        dirs[:] = sorted(dir_ for dir_ in dirs if dir_ != ledger_dir_name and not re.search(output_dir_regex, dir_))
+        jobs += [os.path.join(root, file) for file in sorted(files)]
+    return jobs
+
+
+def run_worker(target, worker_id=None):
+    """claim and unzip archives of target until none is left, return the number of succeeded and failed archives"""
+    target = os.path.abspath(target)
+    ledger = JobLedger(target, worker_id)
+    passwords = getPasswordList(target)
+    hints = PasswordHints()
+    # hard links between the identical intermediate archives of the run
+    reclaimer = Reclaimer()
+    jobs = list_jobs(target)
+    successed = 0
+    failed = 0
+
+    try:
+        # every worker starts at a different place in the list, so that they rarely compete for the same lease
+        offset = int(hashlib.sha1(ledger.worker_id.encode("utf8")).hexdigest(), 16) % max(len(jobs), 1)
+        for path in jobs[offset:] + jobs[:offset]:
+            # it is possible that a part of the multi-part archive is deleted and no longer exists
+            if not os.path.exists(path) or not ledger.claim(path):
+                continue
+            log_msg(f"Worker {ledger.worker_id} claimed {path}", log_level=2)
+            if ledger.was_taken_over(path) and os.path.isdir(f"{path}lv0"):
+                # the output of the crashed worker is partial, the archive is unzipped again from scratch
+                log_msg(f"Removing the partial output {path}lv0 of the crashed worker", log_level=3)
+                shutil.rmtree(f"{path}lv0", ignore_errors=True)
+            try:
+                with LeaseHeartbeat(ledger, path) as heartbeat:
+                    success, lv = unzipFileWith7z(
+                        path,
+                        settings["zip_excutible_path"],
+                        passwords=passwords,
+                        autodelete=settings["autodelete"],
+                        autodeleteexisting=settings["autodeleteexisting"],
+                        on_event=heartbeat.check_lease,
+                        hints=hints,
+                        reclaimer=reclaimer,
+                    )
+                    heartbeat.check_lease()
+                    if settings["automoveup"] and os.path.isdir(path + "lv0"):
+                        move_files_up(path + "lv0")
+            except LeaseLost:
+                log_msg(f"Worker {ledger.worker_id} gave {path} up, another worker took it over", log_level=5)
+                continue
+            if not ledger.complete(path, success):
+                log_msg(f"Worker {ledger.worker_id} lost the lease of {path} at the end of the job", log_level=5)
+                continue
+            if success:
+                successed += 1
+            else:
+                failed += 1
+    finally:
+        # write the timeline of the worker if tracing is enabled, a failed run too, the workers of a tree each write
+        # their own file
+        if settings["trace_file"]:
+            root, ext = os.path.splitext(settings["trace_file"])
+            Tracer.get_instance().save(f"{root}-{ledger.worker_id}{ext}")
+
+    log_msg(f"Worker {ledger.worker_id} finished: {successed:d} unzipped, {failed:d} failed", log_level=4)
+    return successed, failed
+
+
+def run_local_workers(target, workers):
+    """start workers processes on this host working on the same ledger, wait for all of them"""
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(target, f"{socket.gethostname()}-{os.getpid()}-{i:d}"))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return [process.exitcode for process in processes]
+
+
+if __name__ == "__main__":
+    # usage: python ledger.py <target> [number of local workers]
+    if len(sys.argv) > 1 and os.path.isdir(sys.argv[1]):
+        run_local_workers(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 1)
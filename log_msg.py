@@ -1,8 +1,10 @@
 """ logging functions for the application """
+import contextvars
 from datetime import datetime
-from setting import Config
+from setting import settings
 
-settings = Config.get_instance().settings
+# while set, receives (message, log_level) instead of the console or the log file, see api.run
+log_handler = contextvars.ContextVar("log_handler", default=None)
 
 
 # log function, its settings are controlled by global variables
@@ -10,6 +12,10 @@ def log_msg(message, log_level=3):
     """log the message to the console and optionally to a file, automatically add time stamp"""
     # log levels 1=tiny, 2=detailed, 3=normal, 4=important, 5=critical
     if log_level >= settings["log_level"]:
+        handler = log_handler.get()
+        if handler is not None:
+            handler(message, log_level)
+            return
         time_message = datetime.now().strftime("%Y-%m-%d %H:%M:%S") + " "
         for _ in range(log_level):
             time_message += "-"
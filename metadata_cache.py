@@ -0,0 +1,188 @@
+"""persistent cache of the archive listings (format, solid flag, encryption, entries), so that the archives of a share
+already looked at by a previous run are answered without spawning the extractor again
+
+the cache is a SQLite database in WAL mode: several runs (see ledger.py) read it at the same time, a writer does not
+block them. Rows are found by path, size and mtime, or by the content fingerprint when the archive has been moved or
+touched, and the least recently used ones are evicted when the database grows over metadata_cache_max_mb.
+"""
+
+import json
+import os
+import threading
+import time
+
+from archive_listing import ArchiveListing, archive_fingerprint
+from setting import settings
+from log_msg import log_msg
+
+# the cache is stored in the users home directory, next to the settings
+metadata_cache_file_name = ".MultiLevelUnzipperMetadata.sqlite"
+
+# probe statuses that only depend on the archive, "error" may come from the extractor and is never cached
+cached_statuses = ("ok", "encrypted", "not_archive")
+
+# share of the rows evicted at once when the database is too big
+eviction_ratio = 0.1
+
+schema = """
+CREATE TABLE IF NOT EXISTS listings (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    fingerprint TEXT NOT NULL,
+    status TEXT NOT NULL,
+    archive_type TEXT,
+    solid INTEGER NOT NULL,
+    encrypted INTEGER NOT NULL,
+    entry_count INTEGER NOT NULL,
+    uncompressed_size INTEGER NOT NULL,
+    entries TEXT NOT NULL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS listings_fingerprint ON listings (fingerprint);
+CREATE INDEX IF NOT EXISTS listings_last_used ON listings (last_used);
+"""
+
+
+class MetadataCache:
+    """MetadataCache Singleton class, stores the result of probe_archive for every archive listed"""
+
+    _instance = None
+
+    @staticmethod
+    def get_instance():
+        """Get the instance of the singleton class"""
+        if MetadataCache._instance is None:
+            MetadataCache()
+        return MetadataCache._instance
+
+    def __init__(self):
+        if MetadataCache._instance is not None:
+            raise Exception("This class is a singleton!")
+        else:
+            MetadataCache._instance = self
+            self.cache_file = os.path.join(os.path.expanduser("~"), metadata_cache_file_name)
+            self._lock = threading.Lock()
+            self._error = Exception
+            self._connection = self._connect()
+
+    def _connect(self):
+        """open the database, None if it cannot be used (the listings are then always made by the extractor)"""
+        # sqlite3 is only imported by runs that list archives
+        import sqlite3
+
+        self._error = sqlite3.Error
+        try:
+            connection = sqlite3.connect(self.cache_file, timeout=10, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(schema)
+            return connection
+        except sqlite3.Error as e:
+            log_msg(f"Metadata cache {self.cache_file} is unusable ({e}), listing without it", log_level=4)
+            return None
+
+    def _execute(self, query, parameters=()):
+        """run query with the lock held, return the rows, None if the database failed"""
+        if self._connection is None:
+            return None
+        with self._lock:
+            try:
+                with self._connection:
+                    return self._connection.execute(query, parameters).fetchall()
+            except self._error as e:
+                log_msg(f"Metadata cache query failed: {e}", log_level=2)
+                return None
+
+    def lookup(self, file):
+        """return the cached (ArchiveListing or None, status) of file, None if the archive is not in the cache, and
+        the fingerprint of file if it had to be computed (given back to store on a miss, None otherwise)"""
+        try:
+            stat = os.stat(file)
+        except OSError:
+            return None, None
+        rows = self._execute(
+            "SELECT path, status, archive_type, solid, entries FROM listings "
+            "WHERE path = ? AND size = ? AND mtime_ns = ?",
+            (file, stat.st_size, stat.st_mtime_ns),
+        )
+        if not rows:
+            # moved, copied or touched: the content is recognized by its fingerprint, which reads 128 KiB at most
+            try:
+                fingerprint = archive_fingerprint(file)
+            except OSError:
+                return None, None
+            rows = self._execute(
+                "SELECT path, status, archive_type, solid, entries FROM listings WHERE fingerprint = ? LIMIT 1",
+                (fingerprint,),
+            )
+            if not rows:
+                return None, fingerprint
+            path, status, archive_type, solid, entries = rows[0]
+            listing = _to_listing(status, archive_type, solid, entries)
+            # the copy gets its own row, found without fingerprinting next time
+            self.store(file, listing, status, fingerprint)
+            return (listing, status), fingerprint
+
+        path, status, archive_type, solid, entries = rows[0]
+        self._execute("UPDATE listings SET last_used = ? WHERE path = ?", (time.time(), path))
+        return (_to_listing(status, archive_type, solid, entries), status), None
+
+    def store(self, file, listing, status, fingerprint=None):
+        """remember the result of probe_archive for file, statuses that depend on the extractor are not stored,
+        fingerprint is the one lookup computed (the file is read again if None)"""
+        if status not in cached_statuses:
+            return
+        try:
+            stat = os.stat(file)
+            fingerprint = fingerprint or archive_fingerprint(file)
+        except OSError:
+            return
+        entries = listing.entries if listing is not None else []
+        self._execute(
+            "INSERT OR REPLACE INTO listings VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (
+                file,
+                stat.st_size,
+                stat.st_mtime_ns,
+                fingerprint,
+                status,
+                listing.archive_type if listing is not None else None,
+                int(listing.solid) if listing is not None else 0,
+                int(listing.encrypted) if listing is not None else int(status == "encrypted"),
+                len(entries),
+                listing.uncompressed_size if listing is not None else 0,
+                json.dumps(entries, separators=(",", ":")),
+                time.time(),
+            ),
+        )
+        self._evict()
+
+    def _evict(self):
+        """remove the least recently used rows when the database is bigger than metadata_cache_max_mb"""
+        max_bytes = settings["metadata_cache_max_mb"] * 1024 * 1024
+        pages = self._execute("PRAGMA page_count")
+        free_pages = self._execute("PRAGMA freelist_count")
+        page_size = self._execute("PRAGMA page_size")
+        if not pages or not free_pages or not page_size:
+            return
+        # the freed pages are reused by the next rows, they do not count
+        if (pages[0][0] - free_pages[0][0]) * page_size[0][0] <= max_bytes:
+            return
+        count = self._execute("SELECT COUNT(*) FROM listings")
+        evicted = max(int(count[0][0] * eviction_ratio), 1) if count else 1
+        self._execute(
+            "DELETE FROM listings WHERE path IN (SELECT path FROM listings ORDER BY last_used LIMIT ?)",
+            (evicted,),
+        )
+        log_msg(
+            f"Metadata cache over {settings['metadata_cache_max_mb']} MB, {evicted:d} listing(s) evicted",
+            log_level=2,
+        )
+
+
+def _to_listing(status, archive_type, solid, entries):
+    """rebuild the ArchiveListing of a row, None for archives that could not be listed"""
+    if status != "ok":
+        return None
+    return ArchiveListing(archive_type=archive_type, solid=bool(solid), entries=json.loads(entries))
@@ -0,0 +1,89 @@
+"""persistent cache of the archives whose password could not be found, so that the next runs do not try the whole
+password list again, only the passwords added since"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from archive_listing import archive_fingerprint
+from log_msg import log_msg
+
+# the cache is stored in the users home directory, next to the settings
+negative_cache_file_name = ".MultiLevelUnzipperNoPassword.json"
+
+
+def password_digest(password):
+    """short hash of a password, the cache never stores the passwords themselves"""
+    return hashlib.sha256(("MultiLevelUnzipper:" + password).encode("utf8")).hexdigest()[:16]
+
+
+class NegativeCache:
+    """NegativeCache Singleton class, maps archive fingerprints to the digests of the passwords already tried"""
+
+    _instance = None
+
+    @staticmethod
+    def get_instance():
+        """Get the instance of the singleton class"""
+        if NegativeCache._instance is None:
+            NegativeCache()
+        return NegativeCache._instance
+
+    def __init__(self):
+        if NegativeCache._instance is not None:
+            raise Exception("This class is a singleton!")
+        else:
+            NegativeCache._instance = self
+            self.cache_file = os.path.join(os.path.expanduser("~"), negative_cache_file_name)
+            self._lock = threading.Lock()
+            self._entries = self._load()
+            # fingerprinting reads the file, archives whose size is not in the cache are answered without it
+            self._sizes = {entry["size"] for entry in self._entries.values()}
+
+    def _load(self):
+        """read the cache file, an unreadable cache is treated as empty"""
+        if not os.path.exists(self.cache_file):
+            return {}
+        try:
+            with open(self.cache_file, "r", encoding="utf8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            log_msg(f"Negative cache {self.cache_file} is unreadable, starting with an empty one", log_level=4)
+            return {}
+
+    def _save(self):
+        """write the cache file atomically, called with the lock held"""
+        tmp_file = f"{self.cache_file}.tmp-{os.getpid()}"
+        with open(tmp_file, "w", encoding="utf8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_file, self.cache_file)
+
+    def lookup(self, file):
+        """return the fingerprint of file and the set of password digests already tried on it (None if the archive
+        never failed), the fingerprint is None when the size alone shows the archive is not in the cache"""
+        if os.path.getsize(file) not in self._sizes:
+            return None, None
+        fingerprint = archive_fingerprint(file)
+        with self._lock:
+            entry = self._entries.get(fingerprint)
+        return fingerprint, set(entry["tried"]) if entry is not None else None
+
+    def record_failure(self, file, passwords, fingerprint=None):
+        """remember that none of passwords opens file"""
+        fingerprint = fingerprint or archive_fingerprint(file)
+        with self._lock:
+            entry = self._entries.setdefault(fingerprint, {"size": os.path.getsize(file), "tried": []})
+            tried = set(entry["tried"]) | {password_digest(password) for password in passwords}
+            entry["tried"] = sorted(tried)
+            entry["path"] = file
+            entry["updated"] = time.time()
+            self._sizes.add(entry["size"])
+            self._save()
+
+    def forget(self, fingerprint):
+        """the archive has been opened, it no longer belongs to the cache"""
+        with self._lock:
+            if self._entries.pop(fingerprint, None) is not None:
+                self._save()
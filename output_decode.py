@@ -2,10 +2,16 @@
 
 # 7-Zip output messages are directed to stderr, while Bandizip outputs messages to stdout.
 
+import os
 import re
 import subprocess
 
 
+def is_bandizip(executable: str) -> bool:
+    """Check if the extractor is Bandizip (bz.exe) rather than 7-Zip, their command line switches differ."""
+    return os.path.splitext(os.path.basename(executable))[0].lower().startswith("bz")
+
+
 def is_not_archive(result: subprocess.CompletedProcess) -> bool:
     """Check if the file is not an archive based on the result of the unip operation."""
     # when using 7z, if the file is not an archive, it will return 2 and the error message will contain "Cannot open the file as archive"
@@ -0,0 +1,46 @@
+"""passwords found during a run, tried first on the archives likely to share them: the content of an archive opened
+with a password (nested levels reuse it) and the other archives of the same directory (bundles share one)"""
+
+import os
+import threading
+
+
+class PasswordHints:
+    """per-run memory of the passwords that opened archives, shared by the recursion and the parallel jobs"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # output directory ({file}lv{N}) -> password of the archive extracted there
+        self._by_output_dir = {}
+        # directory -> passwords that opened archives in it, the most recent first
+        self._by_dir = {}
+
+    def record(self, file, lv, password):
+        """password opened file, which was extracted to {file}lv{lv}"""
+        if not password:
+            return
+        file = os.path.abspath(file)
+        with self._lock:
+            self._by_output_dir[f"{file}lv{lv:d}"] = password
+            siblings = self._by_dir.setdefault(os.path.dirname(file), [])
+            if password in siblings:
+                siblings.remove(password)
+            siblings.insert(0, password)
+
+    def hints(self, file):
+        """passwords to try first on file as (password, source) pairs, source is "parent" or "sibling" """
+        dir_path = os.path.dirname(os.path.abspath(file))
+        hints = []
+        with self._lock:
+            # the closest archive file was extracted from, file may be in a subdirectory of its output directory
+            path = dir_path
+            while True:
+                if path in self._by_output_dir:
+                    hints.append((self._by_output_dir[path], "parent"))
+                    break
+                parent = os.path.dirname(path)
+                if parent == path:
+                    break
+                path = parent
+            hints += [(password, "sibling") for password in self._by_dir.get(dir_path, [])]
+        return hints
@@ -0,0 +1,232 @@
+"""dry-run planning of an extraction, nothing is written except the plan itself
+
+the plan lists every archive of the target with its format, volume set, uncompressed size, the nested archives it
+contains, whether it needs a password and whether it is projected to be the last level, plus an estimation of the
+wall time. A saved plan can be executed later without scanning the target again.
+"""
+
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from archive_listing import is_archive_name, matches_filters, probe_archive, sniff_signature
+from last_level import check_if_listing_is_last_level
+from setting import settings
+from log_msg import log_msg
+from password_hints import PasswordHints
+from reclaim import Reclaimer
+from tracing import Tracer
+from unzipper import (
+    find_volumes,
+    get_lister_path,
+    getPasswordList,
+    list_target_files,
+    move_files_up,
+    multi_archive_regex,
+    unzipFileWith7z,
+)
+
+
+# archives bigger than this are not used to measure the decompression speed, it would take too long
+calibration_max_size = 64 * 1024 * 1024
+
+
+def plan_file(file, z7path, spawn_times):
+    """plan the extraction of one file, the duration of each listing is appended to spawn_times"""
+    node = {
+        # the plan may be executed from another working directory
+        "path": os.path.abspath(file),
+        "size": os.path.getsize(file),
+        "mtime": os.path.getmtime(file),
+    }
+
+    # the same checks as unzipFileWith7z, without their side effects
+    if file.endswith(".lib") or file.endswith(".dll") or file.endswith(".exe"):
+        node["status"] = "skipped_extension"
+        return node
+    if re.search(multi_archive_regex, file):
+        node["status"] = "skipped_volume"
+        return node
+    if os.path.exists(f"{file}lv0"):
+        node["status"] = "output_exists"
+        return node
+
+    node["signature"] = sniff_signature(file)
+    if node["signature"] is None and not is_archive_name(file):
+        # no magic bytes and no archive extension, the extractor is not even started
+        node["status"] = "not_archive"
+        return node
+
+    start = time.perf_counter()
+    listing, status = probe_archive(file, z7path)
+    spawn_times.append(time.perf_counter() - start)
+    node["status"] = status
+    if status == "encrypted":
+        # the headers are encrypted, nothing more can be known without the password
+        node["needs_password"] = True
+    if listing is None:
+        return node
+
+    parts, complete = find_volumes(file)
+    # only the files selected by the include / exclude filters will be written
+    files = [
+        entry
+        for entry in listing.entries
+        if not entry["is_dir"] and matches_filters(entry["path"], settings["include_filters"], settings["exclude_filters"])
+    ]
+    node.update(
+        {
+            "format": listing.archive_type,
+            "solid": listing.solid,
+            "needs_password": listing.encrypted,
+            "volumes": parts,
+            "volumes_complete": complete,
+            "uncompressed_size": sum(entry["size"] for entry in files),
+            "entries": len(files),
+            "nested": [
+                {"path": entry["path"], "size": entry["size"]} for entry in files if is_archive_name(entry["path"])
+            ],
+            "last_level": check_if_listing_is_last_level([entry["path"] for entry in files]),
+        }
+    )
+    return node
+
+
+def calibrate_seconds_per_byte(nodes, z7path, spawn_cost):
+    """measure the decompression speed by testing (7z t, nothing written) the biggest small unencrypted archive,
+    return None if there is no suitable archive"""
+    candidates = [
+        node
+        for node in nodes
+        if node["status"] == "ok"
+        and not node["needs_password"]
+        and 0 < node["uncompressed_size"]
+        and node["size"] <= calibration_max_size
+    ]
+    if not candidates:
+        return None
+    node = max(candidates, key=lambda node: node["size"])
+    start = time.perf_counter()
+    subprocess.run(
+        [z7path, "t", node["path"]],
+        capture_output=True,
+        stdin=subprocess.DEVNULL,
+        check=False,
+    )
+    elapsed = time.perf_counter() - start - spawn_cost
+    return max(elapsed, 0) / node["uncompressed_size"]
+
+
+def estimate(nodes, spawn_cost, seconds_per_byte, password_count):
+    """estimate the number of extractor runs, the bytes written and the wall time of the plan"""
+    spawns = 0
+    written = 0
+    for node in nodes:
+        if node["status"] not in ("ok", "encrypted"):
+            # rejected by unzipFileWith7z before or by its first run of the extractor
+            spawns += 0 if node["status"].startswith("skipped") or node["status"] == "output_exists" else 1
+            continue
+        spawns += 1
+        if node.get("needs_password"):
+            # on average half of the list is tried before the right password
+            spawns += max(password_count // 2, 1)
+        written += node.get("uncompressed_size", 0)
+        if not node.get("last_level", False):
+            # every extracted file is tried at the next level, nested archives are extracted again
+            spawns += node.get("entries", 0)
+            written += sum(nested["size"] for nested in node.get("nested", []))
+    return {
+        "spawns": spawns,
+        "bytes_written": written,
+        "seconds_per_spawn": spawn_cost,
+        "seconds_per_byte": seconds_per_byte,
+        "wall_time_seconds": spawns * spawn_cost + written * seconds_per_byte,
+    }
+
+
+def plan(target, plan_file_name=None):
+    """scan target without extracting anything, return the plan (and save it to plan_file_name if given)"""
+    target = os.path.abspath(target)
+    z7path = get_lister_path(settings["zip_excutible_path"])
+    passwords = getPasswordList(target)
+    spawn_times = []
+    nodes = []
+    for file in list_target_files(target):
+        nodes.append(plan_file(file, z7path, spawn_times))
+
+    spawn_cost = sum(spawn_times) / len(spawn_times) if spawn_times else 0
+    seconds_per_byte = calibrate_seconds_per_byte(nodes, z7path, spawn_cost)
+    if seconds_per_byte is None:
+        seconds_per_byte = settings["plan_seconds_per_mb"] / 1024 / 1024
+
+    archives = [node for node in nodes if node["status"] in ("ok", "encrypted")]
+    result = {
+        "target": target,
+        "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "files": nodes,
+        "totals": {
+            "files": len(nodes),
+            "archives": len(archives),
+            "needs_password": sum(1 for node in archives if node.get("needs_password")),
+            "incomplete_volumes": sum(1 for node in archives if not node.get("volumes_complete", True)),
+            "nested_archives": sum(len(node.get("nested", [])) for node in archives),
+            "uncompressed_size": sum(node.get("uncompressed_size", 0) for node in archives),
+        },
+        "estimate": estimate(nodes, spawn_cost, seconds_per_byte, len(passwords)),
+    }
+    log_msg(
+        f"Plan: {len(archives):d} archives, {result['totals']['uncompressed_size'] / 1024 / 1024:.2f} MB, "
+        f"about {result['estimate']['wall_time_seconds']:.0f} s",
+        log_level=4,
+    )
+
+    if plan_file_name:
+        with open(plan_file_name, "w", encoding="utf8") as f:
+            json.dump(result, f, indent=4)
+    return result
+
+
+def execute_plan(plan_file_name):
+    """unzip the archives of a saved plan, files that changed since the plan was made are skipped"""
+    with open(plan_file_name, "r", encoding="utf8") as f:
+        saved_plan = json.load(f)
+    passwords = getPasswordList(saved_plan["target"])
+    hints = PasswordHints()
+    # hard links between the identical intermediate archives of the run
+    reclaimer = Reclaimer()
+
+    try:
+        for node in saved_plan["files"]:
+            if node["status"] not in ("ok", "encrypted"):
+                continue
+            file = node["path"]
+            if not os.path.exists(file) or os.path.getsize(file) != node["size"] or os.path.getmtime(file) != node["mtime"]:
+                log_msg(f"-- {file} changed since the plan was made, skipping...", log_level=5)
+                continue
+            success, lv = unzipFileWith7z(
+                file,
+                settings["zip_excutible_path"],
+                passwords=passwords,
+                autodelete=settings["autodelete"],
+                autodeleteexisting=settings["autodeleteexisting"],
+                hints=hints,
+                reclaimer=reclaimer,
+            )
+            if settings["automoveup"] and os.path.isdir(file + "lv0"):
+                move_files_up(file + "lv0")
+    finally:
+        # write the timeline of the run if tracing is enabled, a failed run too
+        Tracer.get_instance().save()
+
+
+if __name__ == "__main__":
+    # usage: python planner.py <target> [plan.json]
+    #        python planner.py --execute plan.json
+    if len(sys.argv) > 2 and sys.argv[1] == "--execute":
+        execute_plan(sys.argv[2])
+    elif len(sys.argv) > 1 and os.path.exists(sys.argv[1]):
+        plan(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "extraction_plan.json")
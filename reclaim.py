@@ -0,0 +1,67 @@
+"""reclamation of the disk space used by intermediate levels, and tracking of the peak and final disk usage of a run"""
+
+import filecmp
+import os
+import shutil
+import threading
+
+from archive_listing import archive_fingerprint
+from log_msg import log_msg
+
+
+class Reclaimer:
+    """per-run tracker of the disk usage, and memory of the intermediate archives kept, shared by the recursion and
+    the parallel jobs of one run (concurrent runs of the library API each have their own)"""
+
+    def __init__(self, path=None):
+        """track the disk holding path, the disk usage is not sampled if path is None"""
+        self._lock = threading.Lock()
+        self.path = path
+        self.baseline = shutil.disk_usage(path).used if path is not None else 0
+        self.peak = 0
+        self.current = 0
+        self.reclaimed = 0
+        # fingerprint -> intermediate archives kept by the hardlink policy
+        self._kept = {}
+
+    def sample(self):
+        """measure the disk usage, called after each extraction and each reclamation"""
+        if self.path is None:
+            return
+        used = shutil.disk_usage(self.path).used - self.baseline
+        with self._lock:
+            self.current = used
+            self.peak = max(self.peak, used)
+
+    def add_reclaimed(self, nbytes):
+        """count bytes freed by the reclamation policy"""
+        with self._lock:
+            self.reclaimed += nbytes
+
+    def hardlink_duplicate(self, file):
+        """replace file by a hard link to an identical intermediate archive kept earlier in the run,
+        return the number of bytes freed"""
+        fingerprint = archive_fingerprint(file)
+        with self._lock:
+            original = self._kept.setdefault(fingerprint, file)
+        if original == file or not os.path.exists(original) or not filecmp.cmp(original, file, shallow=False):
+            return 0
+        size = os.path.getsize(file)
+        tmp_file = f"{file}.link"
+        try:
+            os.link(original, tmp_file)
+        except OSError:
+            # different filesystem or no hard link support, the copy is kept
+            return 0
+        os.replace(tmp_file, file)
+        return size
+
+    def report(self):
+        """log the peak and final disk usage of the run, return them in bytes"""
+        self.sample()
+        log_msg(
+            f"Disk usage of the run: peak {self.peak / 1024 / 1024:.2f} MB, final {self.current / 1024 / 1024:.2f} MB, "
+            f"{self.reclaimed / 1024 / 1024:.2f} MB reclaimed from intermediate levels",
+            log_level=4,
+        )
+        return self.peak, self.current
@@ -3,10 +3,12 @@
 import json
 import os
 import shutil
-from datetime import datetime
+from collections.abc import MutableMapping
 
 # the settings .json file will be stored in the users home directory
 setting_file_name = ".MultiLevelUnzipperSettings.json"
+# validated copy of the settings, used as long as the settings file is not modified
+snapshot_file_name = ".MultiLevelUnzipperSettings.snapshot.json"
 
 
 class Config:
@@ -48,8 +50,38 @@ class Config:
             "unzipsubfolder": True,
             "log_level": 3,
             "pass_in_file_seperator": "_",
+            "admission_control": True,
+            "admission_margin_mb": 256,
+            "admission_wait_seconds": 600,
+            "max_parallel_jobs": 1,
+            "trace_file": "",
+            "profile_file": "",
+            "ledger_lease_seconds": 300,
+            "plan_seconds_per_mb": 0.01,
+            "thread_budget": 0,
+            "thread_budget_file": "",
+            "child_nice": 0,
+            "child_ionice_class": "",
+            "negative_cache": True,
+            "reclaim_intermediate": "delete",
+            "keep_top_level_archives": True,
+            "fused_tarballs": True,
+            "include_filters": [],
+            "exclude_filters": [],
+            "metadata_cache": True,
+            "metadata_cache_max_mb": 64,
+            "parallel_extract_workers": 1,
+            "parallel_extract_min_mb": 1024,
         }
 
+        # the validation below (upgrade of an old file, search of the extractors) only runs when the settings file
+        # changed since the last load
+        snapshot_file = os.path.join(home, snapshot_file_name)
+        snapshot = load_snapshot(snapshot_file, settings_file, temp_settings)
+        if snapshot is not None:
+            return snapshot
+        defaults = dict(temp_settings)
+
         # if the file doesn't exist, create it and write the default settings
         if not os.path.exists(settings_file):
             # try to find the 7z.exe here
@@ -114,9 +146,82 @@ class Config:
                         + settings_file
                         + ", remember to use DOUBLE backslashes (\\\\) to escape the backslashes"
                     )
+            else:
+                # an extractor that cannot be found is searched again on the next run
+                save_snapshot(snapshot_file, settings_file, defaults, temp_settings)
         return temp_settings
 
 
+class LazySettings(MutableMapping):
+    """the settings dict of Config, loaded on first use so that importing a module reads no file"""
+
+    def _settings(self):
+        return Config.get_instance().settings
+
+    def __getitem__(self, key):
+        return self._settings()[key]
+
+    def __setitem__(self, key, value):
+        self._settings()[key] = value
+
+    def __delitem__(self, key):
+        del self._settings()[key]
+
+    def __iter__(self):
+        return iter(self._settings())
+
+    def __len__(self):
+        return len(self._settings())
+
+    def __repr__(self):
+        return repr(self._settings())
+
+
+settings = LazySettings()
+
+
+def settings_stamp(settings_file):
+    """modification time and size of the settings file, None if it does not exist"""
+    try:
+        stat = os.stat(settings_file)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def load_snapshot(snapshot_file, settings_file, defaults):
+    """return the validated settings if the settings file and the defaults did not change since they were saved,
+    otherwise None"""
+    stamp = settings_stamp(settings_file)
+    if stamp is None:
+        return None
+    try:
+        with open(snapshot_file, "r", encoding="utf8") as f:
+            snapshot = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # a new version may come with new defaults, the settings file is then upgraded again
+    if not isinstance(snapshot, dict) or snapshot.get("stamp") != stamp or snapshot.get("defaults") != defaults:
+        return None
+    return snapshot.get("settings")
+
+
+def save_snapshot(snapshot_file, settings_file, defaults, validated_settings):
+    """save the validated settings with the stamp of the settings file they were read from"""
+    stamp = settings_stamp(settings_file)
+    if stamp is None:
+        return
+    temp_file = f"{snapshot_file}.{os.getpid():d}.tmp"
+    try:
+        with open(temp_file, "w", encoding="utf8") as f:
+            json.dump({"stamp": stamp, "defaults": defaults, "settings": validated_settings}, f)
+        os.replace(temp_file, snapshot_file)
+    except OSError:
+        # the snapshot is only a shortcut, the settings are validated again next time
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+
+
 def find7z():
     """find the 7z.exe, return the path if found, otherwise return None"""
     path = shutil.which("7z.exe")
@@ -0,0 +1,108 @@
+"""single-pass extraction of compressed tarballs (.tar.gz, .tar.xz, .tar.bz2, .tar.zst)
+
+with the extractor a compressed tarball takes two levels: the outer stream is inflated to a .tar, which is then
+unzipped again. Here the decompressor is streamed straight into the tar member extraction, the payload is written once
+and the intermediate .tar never exists.
+"""
+
+import os
+import re
+import shutil
+import tarfile
+
+from archive_listing import sniff_signature
+from log_msg import log_msg
+
+# extension -> compression of the tar stream
+tarball_regex = r"\.(?:tar\.(gz|xz|bz2|zst)|(tgz|txz|tbz2?|tzst))$"
+short_extensions = {"tgz": "gz", "txz": "xz", "tbz": "bz2", "tbz2": "bz2", "tzst": "zst"}
+
+# compression -> signature name given by sniff_signature
+compression_signatures = {"gz": "gzip", "xz": "xz", "bz2": "bzip2", "zst": "zstd"}
+
+
+def tarball_compression(file):
+    """return the compression of a compressed tarball ("gz", "xz", "bz2" or "zst"), None for any other file"""
+    match = re.search(tarball_regex, file, flags=re.IGNORECASE)
+    if match is None:
+        return None
+    compression = match.group(1) or short_extensions[match.group(2)]
+    compression = compression.lower()
+    # the extension is not enough, a renamed file would fail halfway through the stream
+    if sniff_signature(file) != compression_signatures[compression]:
+        return None
+    return compression
+
+
+def open_tar_stream(file, compression):
+    """open the tarball as a stream of members, return the TarFile and the raw file to close, None if the
+    compression is not supported by this Python"""
+    if compression != "zst":
+        return tarfile.open(file, f"r|{compression}"), None
+    if "zst" in tarfile.TarFile.OPEN_METH:
+        return tarfile.open(file, "r|zst"), None
+    try:
+        # optional, only needed for .tar.zst before Python 3.14, imported by the runs that meet one
+        import zstandard
+    except ImportError:
+        return None
+    raw = open(file, "rb")
+    try:
+        reader = zstandard.ZstdDecompressor().stream_reader(raw)
+        return tarfile.open(fileobj=reader, mode="r|"), raw
+    except Exception:
+        raw.close()
+        raise
+
+
+def extract_tarball(file, output_dir, member_filter=None):
+    """extract the compressed tarball file to output_dir in one pass, member_filter(name) tells which regular
+    files to write (all of them if None). Return "ok" or "error", or None if the file must go through the extractor
+    (not a compressed tarball, unsupported compression, or not a tar once decompressed)"""
+    compression = tarball_compression(file)
+    if compression is None:
+        return None
+    if not hasattr(tarfile, "data_filter"):
+        # without the data filter a member could be written outside output_dir, the extractor refuses those
+        log_msg(f"tarfile has no data filter in this Python, {file} goes through the extractor", log_level=2)
+        return None
+    try:
+        opened = open_tar_stream(file, compression)
+    except (tarfile.ReadError, OSError, EOFError):
+        # a compressed single file rather than a tarball, the extractor knows how to handle it
+        return None
+    if opened is None:
+        log_msg(f"zstandard is not installed, {file} goes through the extractor", log_level=2)
+        return None
+    tar, raw = opened
+
+    written = 0
+    try:
+        with tar:
+            for member in tar:
+                if member.isfile() and member_filter is not None and not member_filter(member.name):
+                    continue
+                # refuses absolute paths, links outside output_dir, device files...
+                tar.extract(member, output_dir, filter="data")
+                written += member.size if member.isfile() else 0
+    except tarfile.ReadError:
+        if written == 0:
+            # a compressed single file rather than a tarball, the extractor knows how to handle it
+            shutil.rmtree(output_dir, ignore_errors=True)
+            return None
+        log_msg(f"Tarball {file} is truncated or corrupted", log_level=5)
+        shutil.rmtree(output_dir, ignore_errors=True)
+        return "error"
+    except (OSError, EOFError, tarfile.TarError) as e:
+        log_msg(f"Error when unzipping tarball {file}: {e}", log_level=5)
+        shutil.rmtree(output_dir, ignore_errors=True)
+        return "error"
+    finally:
+        if raw is not None:
+            raw.close()
+
+    if not os.path.isdir(output_dir):
+        # empty tarball
+        os.makedirs(output_dir)
+    log_msg(f"Tarball {file} unzipped to {output_dir} in one pass ({written / 1024 / 1024:.2f} MB)", log_level=3)
+    return "ok"
@@ -0,0 +1,46 @@
+"""the tests run against tests/stub_7z.py with a home directory of their own, so that the settings and caches of the
+user are never read or written
+
+    python -m pytest -q tests
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+import pytest
+
+repo_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, repo_dir)
+
+# the settings are loaded on first use, the home directory is switched before any test touches them
+home_dir = tempfile.mkdtemp(prefix="mlu_test_home_")
+os.environ["HOME"] = home_dir
+os.environ["USERPROFILE"] = home_dir
+
+# the extractor has to be an executable, the stub is started by the interpreter running the tests
+stub_path = os.path.join(home_dir, "7z")
+with open(stub_path, "w", encoding="utf8") as f:
+    f.write(f'#!/bin/sh\nexec "{sys.executable}" "{os.path.join(repo_dir, "tests", "stub_7z.py")}" "$@"\n')
+os.chmod(stub_path, 0o755)
+
+with open(os.path.join(home_dir, ".MultiLevelUnzipperSettings.json"), "w", encoding="utf8") as f:
+    json.dump(
+        {
+            "zip_excutible_path": stub_path,
+            "zip_excutible_path_7z": stub_path,
+            "use_bandizip": False,
+            "autodelete": False,
+            "automoveup": False,
+        },
+        f,
+    )
+
+
+@pytest.fixture
+def z7path():
+    """path of the stub extractor"""
+    if os.name == "nt":
+        pytest.skip("the stub extractor is a shell script")
+    return stub_path
@@ -0,0 +1,65 @@
+"""zipfile reads password protected zip files but cannot write them, the tests make theirs with the traditional
+PKWARE encryption, one stored file per archive"""
+
+import struct
+import zlib
+
+
+def _crc32_byte(crc, byte):
+    return zlib.crc32(bytes([byte]), crc ^ 0xFFFFFFFF) ^ 0xFFFFFFFF
+
+
+def _encrypt(data, password):
+    keys = [0x12345678, 0x23456789, 0x34567890]
+
+    def update_keys(byte):
+        keys[0] = _crc32_byte(keys[0], byte)
+        keys[1] = ((keys[1] + (keys[0] & 0xFF)) * 134775813 + 1) & 0xFFFFFFFF
+        keys[2] = _crc32_byte(keys[2], keys[1] >> 24)
+
+    for byte in password.encode("utf8"):
+        update_keys(byte)
+    encrypted = bytearray()
+    for byte in data:
+        temp = (keys[2] | 2) & 0xFFFF
+        encrypted.append(byte ^ (((temp * (temp ^ 1)) >> 8) & 0xFF))
+        update_keys(byte)
+    return bytes(encrypted)
+
+
+def write_encrypted_zip(path, name, data, password):
+    """write a zip file at path holding the file name with data, encrypted with password"""
+    name = name.encode("utf8")
+    crc = zlib.crc32(data)
+    # 11 bytes of padding then the check byte, the high byte of the crc
+    payload = _encrypt(bytes(11) + bytes([crc >> 24]) + data, password)
+    date = (1 << 5) | 1
+    local_header = struct.pack(
+        "<4s2B4HL2L2H", b"PK\x03\x04", 20, 0, 1, 0, 0, date, crc, len(payload), len(data), len(name), 0
+    )
+    central_header = struct.pack(
+        "<4s4B4HL2L5H2L",
+        b"PK\x01\x02",
+        20,
+        0,
+        20,
+        0,
+        1,
+        0,
+        0,
+        date,
+        crc,
+        len(payload),
+        len(data),
+        len(name),
+        0,
+        0,
+        0,
+        0,
+        0,
+        0,
+    )
+    central_offset = len(local_header) + len(name) + len(payload)
+    end = struct.pack("<4s4H2LH", b"PK\x05\x06", 0, 0, 1, 1, len(central_header) + len(name), central_offset, 0)
+    with open(path, "wb") as f:
+        f.write(local_header + name + payload + central_header + name + end)
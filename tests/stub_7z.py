@@ -0,0 +1,79 @@
+"""stand-in for 7z used by the tests, understands zip files only (whatever their extension)
+
+    stub_7z.py l -slt <archive>
+    stub_7z.py x|t [-p<password>] [-o<dir>|-o:<dir>] <archive> [@<list file>]
+
+the exit codes and messages are the ones output_decode.py looks for
+"""
+
+import os
+import sys
+import zipfile
+
+
+def main(args):
+    """run the command, return the exit code"""
+    command = args[0]
+    password = None
+    output_dir = None
+    files = []
+    list_files = []
+    for arg in args[1:]:
+        if arg.startswith("-p"):
+            password = arg[2:]
+        elif arg.startswith("-o:"):
+            output_dir = arg[3:]
+        elif arg.startswith("-o"):
+            output_dir = arg[2:]
+        elif arg.startswith("@"):
+            list_files.append(arg[1:])
+        elif not arg.startswith("-"):
+            files.append(arg)
+
+    try:
+        archive = zipfile.ZipFile(files[0])
+    except (OSError, zipfile.BadZipFile):
+        sys.stderr.write("ERROR: Cannot open the file as archive\n")
+        return 2
+    encrypted = any(info.flag_bits & 1 for info in archive.infolist())
+
+    if command == "l":
+        print(f"Listing archive: {files[0]}\n\n--\nPath = {files[0]}\nType = zip\n\n----------")
+        for info in archive.infolist():
+            print(f"Path = {info.filename.rstrip('/')}")
+            print(f"Folder = {'+' if info.is_dir() else '-'}")
+            print(f"Size = {info.file_size}")
+            print(f"Packed Size = {info.compress_size}")
+            print(f"Encrypted = {'+' if info.flag_bits & 1 else '-'}\n")
+        return 0
+
+    wanted = None
+    if list_files:
+        wanted = set()
+        for list_file in list_files:
+            with open(list_file, "r", encoding="utf8") as f:
+                wanted.update(name for name in f.read().split("\n") if name)
+    try:
+        for info in archive.infolist():
+            if wanted is not None and info.filename.rstrip("/") not in wanted:
+                continue
+            data = archive.read(info, pwd=(password or "").encode() if encrypted else None)
+            if command != "x":
+                continue
+            path = os.path.join(output_dir, info.filename)
+            if info.is_dir():
+                os.makedirs(path, exist_ok=True)
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(data)
+    except RuntimeError:
+        sys.stderr.write("ERROR: Wrong password : " + info.filename + "\n")
+        return 2
+    if command == "x":
+        os.makedirs(output_dir, exist_ok=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
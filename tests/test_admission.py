@@ -0,0 +1,55 @@
+"""admission control (admission.py, admit_extraction)"""
+
+import os
+import shutil
+import zipfile
+
+import pytest
+
+import unzipper
+from admission import AdmissionController
+from setting import settings
+from unzipper import average_job_bytes, unzipFileWith7z
+
+
+def test_margin_does_not_reject_a_job_alone(tmp_path):
+    controller = AdmissionController.get_instance()
+    margin = shutil.disk_usage(tmp_path).free * 2
+    reservation = controller.admit(str(tmp_path), 1, margin=margin)
+    assert reservation is not None
+    # with another job running the margin is kept free between them
+    assert controller.admit(str(tmp_path), 1, margin=margin, timeout=0) is None
+    reservation.release()
+    with controller.admit(str(tmp_path), 1, margin=margin) as reservation:
+        assert reservation.nbytes == 1
+
+
+def test_archive_bigger_than_the_disk_is_rejected(tmp_path):
+    free = shutil.disk_usage(tmp_path).free
+    assert AdmissionController.get_instance().admit(str(tmp_path), free * 2, timeout=60) is None
+
+
+def test_not_archive_is_not_extracted(tmp_path, z7path, monkeypatch):
+    (tmp_path / "notes.zip").write_text("not an archive")
+
+    def run_extractor(args, waiting_message, parts=1):
+        pytest.fail("the extractor is run on a file it could not list")
+
+    monkeypatch.setattr(unzipper, "run_extractor", run_extractor)
+    events = []
+    assert unzipFileWith7z(str(tmp_path / "notes.zip"), z7path, [""], on_event=events.append) == (False, 0)
+    assert events[-1].reason == "not_archive"
+    assert not (tmp_path / "notes.ziplv0").exists()
+
+
+def test_jobs_are_sized_by_their_uncompressed_size(tmp_path, z7path, monkeypatch):
+    for name, size in (("a.zip", 1000), ("b.zip", 3000)):
+        with zipfile.ZipFile(tmp_path / name, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("content.txt", b"x" * size)
+    (tmp_path / "notes.txt").write_text("not an archive")
+    files = sorted(str(path) for path in tmp_path.iterdir())
+
+    assert average_job_bytes(files, z7path) == 2000
+    # without the metadata cache the archives would be listed twice, their packed size is used instead
+    monkeypatch.setitem(settings, "metadata_cache", False)
+    assert average_job_bytes(files, z7path) == sum(os.path.getsize(file) for file in files[:2]) // 2
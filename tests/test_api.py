@@ -0,0 +1,33 @@
+"""library API (api.py)"""
+
+import zipfile
+
+import pytest
+
+from api import extract
+from events import LogMessage, RunFinished
+from setting import settings
+
+
+def test_events_instead_of_output(tmp_path, z7path, capsys):
+    with zipfile.ZipFile(tmp_path / "a.zip", "w") as archive:
+        archive.writestr("content.txt", "data")
+    # the settings file is completed and reported when first loaded, not by the run
+    settings.get("log_level")
+    capsys.readouterr()
+
+    events = list(extract(str(tmp_path), {"zip_excutible_path": z7path, "max_parallel_jobs": 0}))
+
+    assert isinstance(events[-1], RunFinished)
+    assert events[-1].succeeded == 1
+    assert any(isinstance(event, LogMessage) for event in events)
+    assert (tmp_path / "a.ziplv0" / "content.txt").exists()
+    assert capsys.readouterr().out == ""
+
+
+def test_failed_run_raises(tmp_path):
+    with zipfile.ZipFile(tmp_path / "a.zip", "w") as archive:
+        archive.writestr("content.txt", "data")
+
+    with pytest.raises(FileNotFoundError):
+        list(extract(str(tmp_path), {"zip_excutible_path": str(tmp_path / "missing" / "7z")}))
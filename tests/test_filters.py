@@ -0,0 +1,69 @@
+"""include / exclude filters (include_filters and exclude_filters settings)"""
+
+import io
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from archive_listing import matches_filters
+from events import ArchiveFinished
+from tarball import extract_tarball
+from unzipper import filter_switches, unzipFileWith7z
+
+
+def test_matches_filters():
+    assert matches_filters("folder/photo.jpg")
+    assert matches_filters("folder/photo.jpg", include=["*.jpg"])
+    assert not matches_filters("folder/notes.txt", include=["*.jpg"])
+    assert not matches_filters("folder\\photo.jpg", exclude=["*.jpg"])
+    # archives are always extracted so that the next levels are unzipped, unless explicitly excluded
+    assert matches_filters("folder/nested.zip", include=["*.jpg"])
+    assert matches_filters("folder/nested.part1.rar", include=["*.jpg"])
+    assert not matches_filters("folder/nested.zip", include=["*.jpg"], exclude=["nested.*"])
+
+
+def test_filter_switches():
+    assert filter_switches("/usr/bin/7z", [], []) == []
+    switches = filter_switches("/usr/bin/7z", ["*.jpg"], ["*.tmp"])
+    assert switches[0] == "-ir!*.jpg"
+    assert "-ir!*.zip" in switches
+    assert switches[-1] == "-xr!*.tmp"
+    assert filter_switches("/usr/bin/7z", [], ["*.tmp"]) == ["-xr!*.tmp"]
+    # Bandizip has no such switches, everything is extracted
+    assert filter_switches("/opt/bandizip/bz", ["*.jpg"], ["*.tmp"]) == []
+
+
+def test_tarball_member_filter(tmp_path):
+    if not hasattr(tarfile, "data_filter"):
+        pytest.skip("tarballs go through the extractor in this Python")
+    with tarfile.open(tmp_path / "a.tar.gz", "w:gz") as tar:
+        for name in ("photo.jpg", "notes.txt", "nested.zip"):
+            info = tarfile.TarInfo(f"folder/{name}")
+            tar.addfile(info, io.BytesIO(b""))
+
+    status = extract_tarball(
+        str(tmp_path / "a.tar.gz"), str(tmp_path / "out"), lambda name: matches_filters(name, ["*.jpg"])
+    )
+
+    assert status == "ok"
+    assert sorted(os.listdir(tmp_path / "out" / "folder")) == ["nested.zip", "photo.jpg"]
+
+
+def test_extractor_without_filters_reserves_everything(tmp_path, z7path):
+    # the stub extractor under the name of Bandizip: the filters cannot be given to it
+    bandizip = tmp_path / "bz"
+    os.symlink(z7path, bandizip)
+    with zipfile.ZipFile(tmp_path / "a.zip", "w") as archive:
+        archive.writestr("photo.jpg", b"x" * 100)
+        archive.writestr("notes.txt", b"x" * 1000)
+    events = []
+
+    unzipFileWith7z(str(tmp_path / "a.zip"), str(bandizip), [""], on_event=events.append, include_filters=["*.jpg"])
+    unzipFileWith7z(str(tmp_path / "a.zip"), z7path, [""], lv=1, on_event=events.append, include_filters=["*.jpg"])
+
+    reserved = [
+        event.bytes for event in events if isinstance(event, ArchiveFinished) and event.path == str(tmp_path / "a.zip")
+    ]
+    assert reserved == [1100, 100]
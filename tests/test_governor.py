@@ -0,0 +1,71 @@
+"""thread budget and priority of the extractor children (governor.py)"""
+
+import os
+
+import pytest
+
+import governor
+from governor import ResourceGovernor, governed_args
+from setting import settings
+
+
+@pytest.fixture
+def resource_governor(monkeypatch):
+    """a governor of its own with a budget of 8 threads"""
+    monkeypatch.setitem(settings, "thread_budget", 8)
+    monkeypatch.setattr(ResourceGovernor, "_instance", None)
+    return ResourceGovernor.get_instance()
+
+
+def test_thread_switch_after_the_command():
+    assert governed_args(["/usr/bin/7z", "x", "a.zip", "-o:out"], 4) == ["/usr/bin/7z", "x", "-mmt4", "a.zip", "-o:out"]
+    assert governed_args(["/usr/bin/7z", "x", "a.zip"], 0) == ["/usr/bin/7z", "x", "a.zip"]
+    # Bandizip does not know -mmt
+    assert governed_args(["/opt/bandizip/bz", "x", "a.zip"], 4) == ["/opt/bandizip/bz", "x", "a.zip"]
+
+
+@pytest.mark.skipif(os.name == "nt", reason="Windows uses priority classes instead of nice")
+def test_priority_prefix(monkeypatch):
+    monkeypatch.setattr(governor.shutil, "which", lambda command: f"/usr/bin/{command}")
+    monkeypatch.setitem(settings, "child_nice", 10)
+    monkeypatch.setitem(settings, "child_ionice_class", "idle")
+    assert governed_args(["7z", "x", "a.zip"], 2) == ["nice", "-n", "10", "ionice", "-c", "3", "7z", "x", "-mmt2", "a.zip"]
+    monkeypatch.setitem(settings, "child_nice", 0)
+    monkeypatch.setitem(settings, "child_ionice_class", "")
+    assert governed_args(["7z", "x", "a.zip"], 2) == ["7z", "x", "-mmt2", "a.zip"]
+
+
+def test_budget_split_between_jobs_and_parts(resource_governor):
+    resource_governor.set_jobs(2)
+    assert resource_governor.acquire() == 4
+    # an archive extracted in 2 shards, each extractor gets half of the share of its job
+    assert resource_governor.acquire(parts=2) == 2
+    # the last threads of the budget, fewer than a share
+    resource_governor.in_use = 7
+    assert resource_governor.acquire() == 1
+    resource_governor.release(8)
+    assert resource_governor.in_use == 0
+    resource_governor.set_jobs(16)
+    # at least one thread each
+    assert resource_governor.acquire() == 1
+
+
+def test_budget_file_reloaded_during_the_run(tmp_path, resource_governor, monkeypatch):
+    budget_file = tmp_path / "budget.txt"
+    budget_file.write_text("3\n")
+    monkeypatch.setitem(settings, "thread_budget_file", str(budget_file))
+    with resource_governor.threads() as threads:
+        assert threads == 3
+
+    budget_file.write_text("6\n")
+    # the mtime of the file tells that it changed
+    mtime = os.path.getmtime(budget_file) + 10
+    os.utime(budget_file, (mtime, mtime))
+    with resource_governor.threads() as threads:
+        assert threads == 6
+
+    # an unreadable budget is ignored
+    budget_file.write_text("many\n")
+    os.utime(budget_file, (mtime + 10, mtime + 10))
+    with resource_governor.threads() as threads:
+        assert threads == 6
@@ -0,0 +1,159 @@
+"""lease based job ledger shared by several workers (ledger.py)"""
+
+import json
+import multiprocessing
+import os
+import time
+import zipfile
+
+import pytest
+
+from ledger import JobLedger, LeaseHeartbeat, LeaseLost, ledger_dir_name, run_worker
+
+
+def expire_lease(ledger, path, worker="crashed-worker"):
+    """leave the lease of a worker that crashed long ago, return its content"""
+    content = json.dumps({"worker": worker, "path": os.path.basename(path), "expires": time.time() - 60})
+    with open(os.path.join(ledger.lease_dir, ledger._key(path)), "w", encoding="utf8") as f:
+        f.write(content)
+    return content
+
+
+def test_one_worker_per_job(tmp_path):
+    path = str(tmp_path / "a.zip")
+    first = JobLedger(str(tmp_path), "first", lease_seconds=60)
+    second = JobLedger(str(tmp_path), "second", lease_seconds=60)
+    assert first.claim(path)
+    assert not second.claim(path)
+    assert second.renew(path) is False
+    assert first.renew(path)
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    path = str(tmp_path / "a.zip")
+    ledger = JobLedger(str(tmp_path), "alive", lease_seconds=60)
+    expire_lease(ledger, path)
+    assert ledger.claim(path)
+    assert ledger.renew(path)
+
+
+def test_expired_lease_taken_over_by_one_worker_only(tmp_path):
+    path = str(tmp_path / "a.zip")
+    first = JobLedger(str(tmp_path), "first", lease_seconds=60)
+    second = JobLedger(str(tmp_path), "second", lease_seconds=60)
+    expired = expire_lease(first, path)
+    assert first.claim(path)
+    read_lease = second._read_lease
+    reads = []
+
+    def read_before_takeover(lease_file):
+        # second read the expired lease before first replaced it, then renames the fresh lease of first away
+        reads.append(lease_file)
+        return expired if len(reads) == 1 else read_lease(lease_file)
+
+    second._read_lease = read_before_takeover
+    assert not second.claim(path)
+    assert first.renew(path)
+
+
+def test_renewal_does_not_overwrite_a_lease_taken_over(tmp_path):
+    path = str(tmp_path / "a.zip")
+    first = JobLedger(str(tmp_path), "first", lease_seconds=60)
+    second = JobLedger(str(tmp_path), "second", lease_seconds=60)
+    assert first.claim(path)
+    own_lease = first._read_lease(os.path.join(first.lease_dir, first._key(path)))
+    read_lease = first._read_lease
+    reads = []
+
+    def read_before_takeover(lease_file):
+        # first read its own lease, then second took the job over before first wrote the renewal
+        reads.append(lease_file)
+        return own_lease if len(reads) == 1 else read_lease(lease_file)
+
+    os.remove(os.path.join(first.lease_dir, first._key(path)))
+    assert second.claim(path)
+    first._read_lease = read_before_takeover
+    assert not first.renew(path)
+    assert second.owns(path)
+    assert not first.owns(path)
+
+
+def test_job_completed_while_claiming_is_not_taken(tmp_path):
+    path = str(tmp_path / "a.zip")
+    first = JobLedger(str(tmp_path), "first", lease_seconds=60)
+    second = JobLedger(str(tmp_path), "second", lease_seconds=60)
+    create_lease = second._create_lease
+
+    def finish_then_create(lease_file, job):
+        # first finishes the job between the done check of second and the creation of its lease
+        assert first.claim(job)
+        first.complete(job, True)
+        return create_lease(lease_file, job)
+
+    second._create_lease = finish_then_create
+    assert not second.claim(path)
+    assert os.listdir(second.lease_dir) == []
+
+
+def test_complete_needs_the_lease(tmp_path):
+    path = str(tmp_path / "a.zip")
+    first = JobLedger(str(tmp_path), "first", lease_seconds=60)
+    second = JobLedger(str(tmp_path), "second", lease_seconds=60)
+    assert first.claim(path)
+    assert not second.complete(path, True)
+    assert not first.is_done(path)
+    assert first.renew(path)
+    assert first.complete(path, True)
+    assert second.is_done(path)
+
+
+def test_lost_lease_stops_the_job(tmp_path):
+    path = str(tmp_path / "a.zip")
+    first = JobLedger(str(tmp_path), "first", lease_seconds=0.3)
+    second = JobLedger(str(tmp_path), "second", lease_seconds=60)
+    assert first.claim(path)
+    with LeaseHeartbeat(first, path) as heartbeat:
+        # first stalls, its lease expires and second takes the job over before the next renewal
+        os.remove(os.path.join(first.lease_dir, first._key(path)))
+        assert second.claim(path)
+        assert heartbeat.lost.wait(5)
+        with pytest.raises(LeaseLost):
+            heartbeat.check_lease()
+    assert not first.complete(path, True)
+    assert second.renew(path)
+
+
+def test_job_of_crashed_worker_is_unzipped_again(tmp_path, z7path):
+    target = tmp_path / "target"
+    target.mkdir()
+    with zipfile.ZipFile(target / "a.zip", "w") as archive:
+        archive.writestr("content.txt", "data")
+    # the crashed worker had started to write the output
+    (target / "a.ziplv0").mkdir()
+    (target / "a.ziplv0" / "partial.tmp").write_text("")
+    expire_lease(JobLedger(str(target), "alive"), str(target / "a.zip"))
+
+    assert run_worker(str(target), "alive") == (1, 0)
+    assert os.listdir(target / "a.ziplv0") == ["content.txt"]
+    with open(os.path.join(target, ledger_dir_name, "done", os.listdir(target / ledger_dir_name / "done")[0])) as f:
+        assert json.load(f)["success"]
+
+
+def test_workers_processes_unzip_each_archive_once(tmp_path, z7path):
+    target = tmp_path / "target"
+    target.mkdir()
+    names = [f"archive_{i:02d}.zip" for i in range(12)]
+    for name in names:
+        with zipfile.ZipFile(target / name, "w") as archive:
+            archive.writestr("content.txt", name)
+
+    with multiprocessing.Pool(3) as pool:
+        results = pool.starmap(run_worker, [(str(target), f"worker-{i:d}") for i in range(3)])
+
+    assert sum(succeeded for succeeded, failed in results) == len(names)
+    assert sum(failed for succeeded, failed in results) == 0
+    for name in names:
+        with open(target / f"{name}lv0" / "content.txt", "r", encoding="utf8") as f:
+            assert f.read() == name
+    assert len(os.listdir(target / ledger_dir_name / "done")) == len(names)
+    assert os.listdir(target / ledger_dir_name / "leases") == []
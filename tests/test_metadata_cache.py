@@ -0,0 +1,89 @@
+"""persistent cache of the archive listings (metadata_cache.py)"""
+
+import os
+import zipfile
+
+import pytest
+
+import archive_listing
+import metadata_cache
+from archive_listing import ArchiveListing, probe_archive
+from metadata_cache import MetadataCache
+from setting import settings
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """a cache of its own, in an empty home directory"""
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setattr(MetadataCache, "_instance", None)
+    return MetadataCache.get_instance()
+
+
+@pytest.fixture
+def listings(monkeypatch):
+    """names of the archives listed by the extractor"""
+    listed = []
+    run_lister = archive_listing.run_lister
+
+    def count_listings(file, z7path, password=None):
+        listed.append(os.path.basename(file))
+        return run_lister(file, z7path, password)
+
+    monkeypatch.setattr(archive_listing, "run_lister", count_listings)
+    return listed
+
+
+def make_zip(path, content):
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("content.txt", content)
+    return str(path)
+
+
+def test_path_hit(tmp_path, z7path, cache, listings, monkeypatch):
+    file = make_zip(tmp_path / "a.zip", "path hit")
+    fingerprints = []
+    archive_fingerprint = metadata_cache.archive_fingerprint
+
+    def count_fingerprints(file):
+        fingerprints.append(file)
+        return archive_fingerprint(file)
+
+    monkeypatch.setattr(metadata_cache, "archive_fingerprint", count_fingerprints)
+
+    listing, status = probe_archive(file, z7path)
+    assert status == "ok"
+    # the miss reads the file once, for the lookup and the store
+    assert len(fingerprints) == 1
+    assert probe_archive(file, z7path)[0].entries == listing.entries
+    assert listings == ["a.zip"]
+    assert len(fingerprints) == 1
+
+
+def test_fingerprint_hit_after_a_move(tmp_path, z7path, cache, listings):
+    file = make_zip(tmp_path / "a.zip", "fingerprint hit")
+    probe_archive(file, z7path)
+    os.mkdir(tmp_path / "moved")
+    os.rename(file, tmp_path / "moved" / "b.zip")
+
+    listing, status = probe_archive(str(tmp_path / "moved" / "b.zip"), z7path)
+
+    assert status == "ok"
+    assert [entry["path"] for entry in listing.entries] == ["content.txt"]
+    assert listings == ["a.zip"]
+
+
+def test_least_recently_used_rows_are_evicted(tmp_path, cache, monkeypatch):
+    files = [make_zip(tmp_path / f"{name}.zip", name) for name in ("a", "b", "c")]
+    listing = ArchiveListing("zip", entries=[])
+    cache.store(files[0], listing, "ok")
+    cache.store(files[1], listing, "ok")
+    # a is used again, b is now the least recently used
+    assert cache.lookup(files[0])[0] is not None
+
+    monkeypatch.setitem(settings, "metadata_cache_max_mb", 0)
+    cache.store(files[2], listing, "ok")
+
+    assert sorted(row[0] for row in cache._execute("SELECT path FROM listings")) == [files[0], files[2]]
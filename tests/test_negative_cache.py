@@ -0,0 +1,52 @@
+"""archives whose password could not be found (negative_cache.py)"""
+
+import os
+
+import unzipper
+from encrypted_zip import write_encrypted_zip
+from negative_cache import NegativeCache, password_digest
+from unzipper import unzipFileWith7z
+
+
+def test_record_lookup_forget(tmp_path):
+    cache = NegativeCache.get_instance()
+    file = str(tmp_path / "locked.zip")
+    write_encrypted_zip(file, "a.txt", b"record lookup forget", "secret")
+    assert cache.lookup(file)[1] is None
+
+    cache.record_failure(file, ["one", "two"])
+    cache.record_failure(file, ["two", "three"])
+    fingerprint, tried = cache.lookup(file)
+    assert tried == {password_digest(password) for password in ("one", "two", "three")}
+    # the passwords themselves are never stored
+    with open(cache.cache_file, "r", encoding="utf8") as f:
+        assert "three" not in f.read()
+
+    cache.forget(fingerprint)
+    assert cache.lookup(file)[1] is None
+
+
+def test_only_new_passwords_are_tried(tmp_path, z7path, monkeypatch):
+    file = str(tmp_path / "locked.zip")
+    write_encrypted_zip(file, "a.txt", b"only new passwords", "secret")
+    runs = []
+    run_extractor = unzipper.run_extractor
+
+    def count_runs(args, waiting_message, parts=1):
+        runs.append(args)
+        return run_extractor(args, waiting_message, parts)
+
+    monkeypatch.setattr(unzipper, "run_extractor", count_runs)
+
+    # the probe and the two passwords
+    assert unzipFileWith7z(file, z7path, ["wrong1", "wrong2"]) == (False, 0)
+    assert len(runs) == 3
+    # nothing new to try
+    assert unzipFileWith7z(file, z7path, ["wrong1", "wrong2"]) == (False, 0)
+    assert len(runs) == 3
+    # only the password added since
+    unzipFileWith7z(file, z7path, ["wrong1", "wrong2", "secret"])
+    assert len(runs) == 4
+    assert runs[-1][2] == "-psecret"
+    assert NegativeCache.get_instance().lookup(file)[1] is None
+    assert os.path.exists(os.path.join(f"{file}lv0", "a.txt"))
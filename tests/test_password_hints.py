@@ -0,0 +1,71 @@
+"""passwords shared between parents, siblings and nested archives (password_hints.py, password_candidates)"""
+
+import os
+import zipfile
+
+from encrypted_zip import write_encrypted_zip
+from events import PasswordFound
+from password_hints import PasswordHints
+from unzipper import password_candidates, unzipFileWith7z
+
+
+def test_parent_then_siblings_most_recent_first(tmp_path):
+    hints = PasswordHints()
+    hints.record(str(tmp_path / "a.zip"), 0, "first")
+    hints.record(str(tmp_path / "b.zip"), 0, "second")
+    hints.record(str(tmp_path / "c.zip"), 0, "first")
+    # empty passwords (archives that are not protected) are not hints
+    hints.record(str(tmp_path / "d.zip"), 0, "")
+
+    assert hints.hints(str(tmp_path / "e.zip")) == [("first", "sibling"), ("second", "sibling")]
+    assert hints.hints(str(tmp_path / "b.ziplv0" / "folder" / "nested.zip")) == [("second", "parent")]
+    assert hints.hints(str(tmp_path / "other" / "e.zip")) == []
+
+
+def test_candidates_order_without_duplicates(tmp_path):
+    hints = PasswordHints()
+    hints.record(str(tmp_path / "a.zip"), 0, "list2")
+    file = str(tmp_path / "b_name1.zip")
+    assert password_candidates(file, ["list1", "list2", "name1"], hints) == [
+        ("list2", "sibling"),
+        ("name1", "file_name"),
+        ("name1.zip", "file_name"),
+        ("list1", "list"),
+    ]
+    assert password_candidates(file, ["list1"]) == [
+        ("name1", "file_name"),
+        ("name1.zip", "file_name"),
+        ("list1", "list"),
+    ]
+
+
+def test_every_source_is_reported_and_autodeleted(tmp_path, z7path):
+    write_encrypted_zip(tmp_path / "a.zip", "a.txt", b"a", "secret")
+    write_encrypted_zip(tmp_path / "b.zip", "b.txt", b"b", "secret")
+    hints = PasswordHints()
+    events = []
+
+    for name in ("a.zip", "b.zip"):
+        unzipFileWith7z(
+            str(tmp_path / name), z7path, ["", "wrong", "secret"], autodelete=True, on_event=events.append, hints=hints
+        )
+
+    found = [(os.path.basename(event.path), event.source) for event in events if isinstance(event, PasswordFound)]
+    assert found == [("a.zip", "list"), ("b.zip", "sibling")]
+    assert sorted(os.listdir(tmp_path)) == ["a.ziplv0", "b.ziplv0"]
+    assert (tmp_path / "b.ziplv0" / "b.txt").read_bytes() == b"b"
+
+
+def test_archive_not_protected_is_not_a_hint(tmp_path, z7path):
+    write_encrypted_zip(tmp_path / "a.zip", "a.txt", b"a", "secret")
+    with zipfile.ZipFile(tmp_path / "c.zip", "w") as archive:
+        archive.writestr("c.txt", "c")
+    hints = PasswordHints()
+    events = []
+
+    for name in ("a.zip", "c.zip"):
+        unzipFileWith7z(str(tmp_path / name), z7path, ["secret"], on_event=events.append, hints=hints)
+
+    assert [os.path.basename(event.path) for event in events if isinstance(event, PasswordFound)] == ["a.zip"]
+    assert hints.hints(str(tmp_path / "c.ziplv0" / "nested.zip")) == []
+    assert (tmp_path / "c.ziplv0" / "c.txt").exists()
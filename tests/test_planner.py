@@ -0,0 +1,24 @@
+"""dry-run planning and execution of a saved plan (planner.py)"""
+
+import os
+import zipfile
+
+from planner import execute_plan, plan
+
+
+def test_plan_executed_from_another_directory(tmp_path, z7path, monkeypatch):
+    target = tmp_path / "target"
+    target.mkdir()
+    with zipfile.ZipFile(target / "a.zip", "w") as archive:
+        archive.writestr("content.txt", "data")
+    monkeypatch.chdir(tmp_path)
+
+    saved_plan = plan("target", str(tmp_path / "plan.json"))
+    assert [node["path"] for node in saved_plan["files"]] == [str(target / "a.zip")]
+
+    elsewhere = tmp_path / "elsewhere"
+    elsewhere.mkdir()
+    monkeypatch.chdir(elsewhere)
+    execute_plan(str(tmp_path / "plan.json"))
+    assert (target / "a.ziplv0" / "content.txt").exists()
+    assert os.listdir(elsewhere) == []
@@ -0,0 +1,102 @@
+"""reclamation of the intermediate archives (reclaim_intermediate setting)"""
+
+import os
+import zipfile
+
+from reclaim import Reclaimer
+from setting import settings
+from unzipper import archive_parts, find_volumes, reclaim_archive, unzipFileWith7z
+
+
+def touch(dir_path, *names):
+    for name in names:
+        open(os.path.join(dir_path, name), "w").close()
+
+
+def test_archive_parts_ignores_archives_with_the_same_base_name(tmp_path):
+    touch(tmp_path, "abc.7z", "abc.zip", "abc.rar", "abc.001", "abc.z01", "abc.r00", "abc.part1.rar", "abc.part2.rar")
+    assert archive_parts(str(tmp_path / "abc.7z")) == ["abc.7z"]
+    assert archive_parts(str(tmp_path / "abc.zip")) == ["abc.z01", "abc.zip"]
+    assert archive_parts(str(tmp_path / "abc.rar")) == ["abc.r00", "abc.rar"]
+    assert archive_parts(str(tmp_path / "abc.001")) == ["abc.001"]
+    assert archive_parts(str(tmp_path / "abc.part1.rar")) == ["abc.part1.rar", "abc.part2.rar"]
+
+
+def test_archive_parts_of_split_7z(tmp_path):
+    touch(tmp_path, "abc.7z.001", "abc.7z.002", "abc.001", "abc.7z")
+    assert archive_parts(str(tmp_path / "abc.7z.001")) == ["abc.7z.001", "abc.7z.002"]
+
+
+def test_deletion_and_plan_agree_on_the_volumes(tmp_path):
+    touch(tmp_path, "abc.rar", "abc.r00", "abc.r01", "abc.zip", "abc.z01", "abc.z03", "abc.part1.rar", "abc.part2.rar")
+    assert find_volumes(str(tmp_path / "abc.rar")) == (["abc.rar", "abc.r00", "abc.r01"], True)
+    # the .zip is the last volume, z02 is missing
+    assert find_volumes(str(tmp_path / "abc.zip")) == (["abc.z01", "abc.z03", "abc.zip"], False)
+    assert find_volumes(str(tmp_path / "abc.part1.rar")) == (["abc.part1.rar", "abc.part2.rar"], True)
+    for name in ("abc.rar", "abc.zip", "abc.part1.rar"):
+        assert archive_parts(str(tmp_path / name)) == sorted(find_volumes(str(tmp_path / name))[0])
+
+
+def test_reclaim_deletes_only_the_extracted_archive(tmp_path):
+    touch(tmp_path, "abc.7z", "abc.zip", "abc.rar")
+    reclaim_archive(str(tmp_path / "abc.7z"), 1, Reclaimer(), autodelete=True)
+    assert sorted(os.listdir(tmp_path)) == ["abc.rar", "abc.zip"]
+
+
+def test_reclaim_needs_autodelete(tmp_path):
+    touch(tmp_path, "abc.7z")
+    reclaim_archive(str(tmp_path / "abc.7z"), 1, Reclaimer())
+    assert os.listdir(tmp_path) == ["abc.7z"]
+
+
+def test_documents_opened_by_the_extractor_are_kept(tmp_path, z7path):
+    # a .docx is a zip, the extractor opens it like any other archive
+    with zipfile.ZipFile(tmp_path / "report.docx", "w") as document:
+        document.writestr("word/document.xml", "<document/>")
+    with zipfile.ZipFile(tmp_path / "bundle.zip", "w") as archive:
+        archive.write(tmp_path / "report.docx", "report.docx")
+        archive.writestr("data.csv", "a,b")
+    os.remove(tmp_path / "report.docx")
+
+    unzipFileWith7z(str(tmp_path / "bundle.zip"), z7path, [""], autodelete=True)
+
+    level_1 = tmp_path / "bundle.ziplv0"
+    assert sorted(os.listdir(level_1)) == ["data.csv", "report.docx", "report.docxlv1"]
+
+
+def test_same_base_name_archives_are_all_extracted(tmp_path, z7path):
+    # abc.7z is a zip with another extension, the stub extractor only looks at the content
+    for name, payload in (("abc.7z", "from_7z.txt"), ("abc.zip", "from_zip.txt")):
+        with zipfile.ZipFile(tmp_path / name, "w") as archive:
+            archive.writestr(payload, "data")
+    with zipfile.ZipFile(tmp_path / "outer.zip", "w") as archive:
+        archive.write(tmp_path / "abc.7z", "abc.7z")
+        archive.write(tmp_path / "abc.zip", "abc.zip")
+    os.remove(tmp_path / "abc.7z")
+    os.remove(tmp_path / "abc.zip")
+
+    unzipFileWith7z(str(tmp_path / "outer.zip"), z7path, [""], autodelete=True)
+
+    level_1 = tmp_path / "outer.ziplv0"
+    assert (level_1 / "abc.7zlv1" / "from_7z.txt").exists()
+    assert (level_1 / "abc.ziplv1" / "from_zip.txt").exists()
+    # the intermediate archives themselves are reclaimed
+    assert not (level_1 / "abc.7z").exists()
+    assert not (level_1 / "abc.zip").exists()
+
+
+def test_concurrent_runs_have_their_own_disk_usage(tmp_path):
+    first = Reclaimer(str(tmp_path))
+    first.add_reclaimed(100)
+    second = Reclaimer(str(tmp_path))
+    assert first.reclaimed == 100
+    assert second.reclaimed == 0
+
+
+def test_permanent_deletion_is_counted(tmp_path, monkeypatch):
+    monkeypatch.setitem(settings, "reclaim_intermediate", "delete_permanently")
+    (tmp_path / "abc.7z").write_bytes(b"x" * 10)
+    reclaimer = Reclaimer()
+    reclaim_archive(str(tmp_path / "abc.7z"), 1, reclaimer, autodelete=True)
+    assert os.listdir(tmp_path) == []
+    assert reclaimer.reclaimed == 10
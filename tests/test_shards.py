@@ -0,0 +1,95 @@
+"""extraction of big non-solid archives by several extractors at once (extract_in_shards)"""
+
+import os
+import zipfile
+
+import pytest
+
+import unzipper
+from archive_listing import ArchiveListing
+from setting import settings
+from unzipper import extract_in_shards, verify_shards
+
+
+def entry(path, size, is_dir=False, encrypted=False):
+    return {"path": path, "size": size, "packed_size": size, "is_dir": is_dir, "encrypted": encrypted}
+
+
+@pytest.fixture
+def sharded(monkeypatch):
+    """every archive is big enough to be split between 3 extractors"""
+    monkeypatch.setitem(settings, "parallel_extract_workers", 3)
+    monkeypatch.setitem(settings, "parallel_extract_min_mb", 0)
+
+
+@pytest.fixture
+def archive(tmp_path):
+    """zip with files of different sizes and an empty directory"""
+    path = tmp_path / "big.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        for name, size in (("a.bin", 600), ("b.bin", 300), ("c.bin", 200), ("sub/d.bin", 100)):
+            archive.writestr(name, b"x" * size)
+        archive.writestr("empty/", "")
+    return str(path)
+
+
+def test_shards_are_byte_balanced():
+    listing = ArchiveListing(
+        "zip",
+        entries=[entry("a", 100), entry("b", 60), entry("c", 50), entry("d", 40), entry("e", 30), entry("dir", 0, True)],
+    )
+    shards = listing.shards(2)
+    assert sorted(sum(file["size"] for file in shard) for shard in shards) == [140, 140]
+    assert sorted(file["path"] for shard in shards for file in shard) == ["a", "b", "c", "d", "e"]
+    # no empty shard when there are fewer files than extractors
+    assert len(listing.shards(10)) == 5
+    assert [[file["path"] for file in shard] for shard in listing.shards(3, exclude=["a", "b", "c"])] == [["d"], ["e"]]
+
+
+def test_verify_shards(tmp_path):
+    (tmp_path / "a").write_bytes(b"x" * 10)
+    assert verify_shards(str(tmp_path), [[entry("a", 10)]])
+    assert not verify_shards(str(tmp_path), [[entry("a", 10)], [entry("missing", 1)]])
+    assert not verify_shards(str(tmp_path), [[entry("a", 11)]])
+
+
+def test_archive_unzipped_in_shards(archive, z7path, sharded, monkeypatch):
+    commands = []
+    run_extractor = unzipper.run_extractor
+
+    def count_extractors(args, waiting_message, parts=1):
+        commands.append(args)
+        return run_extractor(args, waiting_message, parts)
+
+    monkeypatch.setattr(unzipper, "run_extractor", count_extractors)
+
+    assert extract_in_shards(archive, z7path, 0) == "ok"
+
+    assert len(commands) == 3
+    assert all(command[-1].startswith("@") for command in commands)
+    output_dir = f"{archive}lv0"
+    for name, size in (("a.bin", 600), ("b.bin", 300), ("c.bin", 200), ("sub/d.bin", 100)):
+        assert os.path.getsize(os.path.join(output_dir, name)) == size
+    # the list files only name files, the empty directories are created afterwards
+    assert os.path.isdir(os.path.join(output_dir, "empty"))
+
+
+@pytest.mark.parametrize("solid, encrypted", [(True, False), (False, True)])
+def test_solid_or_encrypted_archive_uses_one_extractor(archive, z7path, sharded, monkeypatch, solid, encrypted):
+    listing = ArchiveListing("zip", solid, [entry(f"{i:d}.bin", 100, encrypted=encrypted) for i in range(4)])
+    monkeypatch.setattr(unzipper, "list_archive", lambda file, z7path, password=None: listing)
+    assert extract_in_shards(archive, z7path, 0) is None
+    assert not os.path.exists(f"{archive}lv0")
+
+
+def test_shard_failing_verification_falls_back(archive, z7path, sharded, monkeypatch):
+    # the listing announces a size the extractor does not write
+    listing = ArchiveListing("zip", entries=[entry("a.bin", 600), entry("b.bin", 300), entry("c.bin", 999)])
+    monkeypatch.setattr(unzipper, "list_archive", lambda file, z7path, password=None: listing)
+    assert extract_in_shards(archive, z7path, 0) is None
+    assert not os.path.exists(f"{archive}lv0")
+
+
+def test_small_archive_uses_one_extractor(archive, z7path, monkeypatch):
+    monkeypatch.setitem(settings, "parallel_extract_workers", 3)
+    assert extract_in_shards(archive, z7path, 0) is None
@@ -0,0 +1,8 @@
+"""startup budget of the entry points (benchmark.py --startup), run in the test suite so that a slow, eager or
+side-effecting import fails the build"""
+
+from benchmark import check_startup
+
+
+def test_startup_within_budget():
+    assert check_startup() == []
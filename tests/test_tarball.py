@@ -0,0 +1,41 @@
+"""single-pass extraction of compressed tarballs (tarball.py)"""
+
+import io
+import sys
+import tarfile
+
+import pytest
+
+from tarball import extract_tarball
+
+
+def make_tarball(path):
+    with tarfile.open(path, "w:gz") as tar:
+        data = b"data"
+        info = tarfile.TarInfo("folder/content.txt")
+        info.size = len(data)
+        tar.addfile(info, io.BytesIO(data))
+
+
+def test_tarball_unzipped_in_one_pass(tmp_path):
+    if not hasattr(tarfile, "data_filter"):
+        pytest.skip("tarballs go through the extractor in this Python")
+    make_tarball(tmp_path / "a.tar.gz")
+    assert extract_tarball(str(tmp_path / "a.tar.gz"), str(tmp_path / "out")) == "ok"
+    assert (tmp_path / "out" / "folder" / "content.txt").read_bytes() == b"data"
+
+
+def test_without_data_filter_the_extractor_is_used(tmp_path, monkeypatch):
+    make_tarball(tmp_path / "a.tar.gz")
+    monkeypatch.delattr(tarfile, "data_filter", raising=False)
+    assert extract_tarball(str(tmp_path / "a.tar.gz"), str(tmp_path / "out")) is None
+    assert not (tmp_path / "out").exists()
+
+
+def test_zstandard_is_not_imported_by_other_tarballs(tmp_path):
+    if not hasattr(tarfile, "data_filter"):
+        pytest.skip("tarballs go through the extractor in this Python")
+    sys.modules.pop("zstandard", None)
+    make_tarball(tmp_path / "a.tar.gz")
+    assert extract_tarball(str(tmp_path / "a.tar.gz"), str(tmp_path / "out")) == "ok"
+    assert "zstandard" not in sys.modules
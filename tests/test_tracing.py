@@ -0,0 +1,55 @@
+"""timeline of a run in the Chrome trace-event format (tracing.py)"""
+
+import json
+import zipfile
+
+import pytest
+
+from api import run
+from ledger import run_worker
+from setting import settings
+from tracing import Tracer, span
+
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    """tracing enabled, to a file of its own"""
+    path = tmp_path / "trace.json"
+    monkeypatch.setitem(settings, "trace_file", str(path))
+    monkeypatch.setattr(Tracer, "_instance", None)
+    return path
+
+
+def test_span_is_a_complete_event(trace_file):
+    with span("extract", file="a.zip", level=0) as trace_args:
+        trace_args["status"] = "ok"
+    Tracer.get_instance().save()
+
+    with open(trace_file, "r", encoding="utf8") as f:
+        trace = json.load(f)
+    [event] = trace["traceEvents"]
+    assert event["name"] == "extract"
+    assert event["ph"] == "X"
+    assert event["ts"] >= 0 and event["dur"] >= 0
+    assert isinstance(event["pid"], int) and isinstance(event["tid"], int)
+    assert event["args"] == {"file": "a.zip", "level": 0, "status": "ok"}
+
+
+def test_failed_library_run_writes_its_trace(tmp_path, trace_file):
+    target = tmp_path / "target"
+    target.mkdir()
+    (target / "a.zip").write_bytes(b"PK\x03\x04")
+    with pytest.raises(OSError):
+        run(str(target), {"zip_excutible_path": str(tmp_path / "missing" / "7z")})
+    with open(trace_file, "r", encoding="utf8") as f:
+        assert json.load(f)["traceEvents"]
+
+
+def test_each_worker_writes_its_trace(tmp_path, trace_file, z7path):
+    target = tmp_path / "target"
+    target.mkdir()
+    with zipfile.ZipFile(target / "a.zip", "w") as archive:
+        archive.writestr("content.txt", "data")
+    assert run_worker(str(target), "worker-1") == (1, 0)
+    with open(tmp_path / "trace-worker-1.json", "r", encoding="utf8") as f:
+        assert any(event["name"] == "extract" for event in json.load(f)["traceEvents"])
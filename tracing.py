@@ -0,0 +1,96 @@
+"""optional timeline of a run in the Chrome trace-event format (open with chrome://tracing or ui.perfetto.dev) and cProfile dumps"""
+
+import io
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from setting import settings
+
+
+class Tracer:
+    """Tracer Singleton class, collects one complete event per phase per archive"""
+
+    _instance = None
+
+    @staticmethod
+    def get_instance():
+        """Get the instance of the singleton class"""
+        if Tracer._instance is None:
+            Tracer()
+        return Tracer._instance
+
+    def __init__(self):
+        if Tracer._instance is not None:
+            raise Exception("This class is a singleton!")
+        else:
+            Tracer._instance = self
+            self.enabled = bool(settings["trace_file"])
+            self._events = []
+            self._lock = threading.Lock()
+            self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, **args):
+        """record the duration of the with block as a complete event, the yielded dict can be filled with more args
+        (byte counts known only at the end for example)"""
+        if not self.enabled:
+            yield args
+            return
+        start = time.perf_counter()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter()
+            event = {
+                "name": name,
+                "cat": "unzipper",
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+            with self._lock:
+                self._events.append(event)
+
+    def save(self, trace_file=None):
+        """write the collected events to trace_file (default: the trace_file setting)"""
+        if not self.enabled:
+            return
+        trace_file = trace_file or settings["trace_file"]
+        with self._lock:
+            events = list(self._events)
+        with open(trace_file, "w", encoding="utf8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+
+def span(name, **args):
+    """shortcut for Tracer.get_instance().span"""
+    return Tracer.get_instance().span(name, **args)
+
+
+def run_profiled(function, *args, **kwargs):
+    """call function, under cProfile if the profile_file setting is set, the raw stats are dumped to profile_file
+    (readable with pstats or snakeviz) and the top functions by cumulative time to profile_file + ".txt"
+    """
+    profile_file = settings["profile_file"]
+    if not profile_file:
+        return function(*args, **kwargs)
+
+    # the profiler is only loaded when it is used
+    import cProfile
+    import pstats
+
+    profiler = cProfile.Profile()
+    try:
+        return profiler.runcall(function, *args, **kwargs)
+    finally:
+        profiler.dump_stats(profile_file)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(40)
+        with open(profile_file + ".txt", "w", encoding="utf8") as f:
+            f.write(summary.getvalue())
@@ -1,22 +1,53 @@
 """MultiLevelUnzipper - unzip multiple levels of zip files at once"""
 
+import contextvars
 import os
 import re
 import shutil
-import subprocess
+import tempfile
 import threading
-import send2trash
 
+from admission import AdmissionController
+from events import ArchiveFinished, ArchiveStarted, LevelReached, PasswordFound
+from archive_listing import (
+    archive_wildcards,
+    is_archive_name,
+    list_archive,
+    matches_filters,
+    probe_archive,
+    sniff_signature,
+)
+from governor import ResourceGovernor, run_governed
 from last_level import check_if_is_last_level
-from setting import Config
+from setting import settings
 from log_msg import log_msg
-from output_decode import is_not_archive, is_wrong_password
+from negative_cache import NegativeCache, password_digest
+from password_hints import PasswordHints
+from reclaim import Reclaimer
+from tarball import extract_tarball
+from output_decode import is_bandizip, is_not_archive, is_wrong_password
+from tracing import span
 
-settings = Config.get_instance().settings
 
 # regex for multi-part archives
 multi_archive_regex = r"\.(?:part[2-9]\d*\.rar|r\d+|z\d+)$"
 
+# multi-part schemes as (regex of the first volume, the base name being group 1, regex of the numbered volumes after
+# the base name, the number being group 1, number of the first numbered volume, place of the volume that is not
+# numbered: "first", "last" or None), the first scheme with other volumes on disk is the one of the archive
+volume_schemes = [
+    (r"(.+)\.part0*1\.rar", r"\.part(\d+)\.rar", 1, None),  # base.part1.rar, base.part2.rar
+    (r"(.+)\.0*01", r"\.(\d{3,})", 1, None),  # base.001, base.002 and base.7z.001, base.7z.002
+    (r"(.+)\.rar", r"\.r(\d{2,})", 0, "first"),  # base.rar, base.r00, base.r01
+    (r"(.+)\.zip", r"\.z(\d{2,})", 1, "last"),  # base.z01, base.z02, base.zip
+]
+
+# sources of the candidates given by PasswordHints
+hint_sources = ("parent", "sibling")
+
+# formats whose entries are compressed independently of each other when the archive is not solid (types of 7z l)
+shardable_types = ("zip", "rar", "rar5", "7z")
+
 
 # get password list
 def getPasswordList(dir_):
@@ -91,69 +122,169 @@ def getPassInFileName(file):
     return possible_passwords
 
 
-def remove_archive(file):
-    """Remove archive files after unzipping, including all parts of multi-part archives."""
-    dir_path = os.path.dirname(file)
-    file_name = os.path.basename(file)
-
-    # Extract base name (strip extensions like .part01.rar, .r00, .001, etc.)
-    base = re.split(r"\.part\d+\.rar|\.r\d+|\.z\d+|\.rar|\.7z|\.zip|\.001", file_name, flags=re.IGNORECASE)[0]
+def get_lister_path(z7path):
+    """listing output is only parsed in the 7z format, use 7z for listing even when Bandizip is used for extraction"""
+    if os.path.exists(settings["zip_excutible_path_7z"]):
+        return settings["zip_excutible_path_7z"]
+    return z7path
+
+
+def admit_extraction(file, z7path, lv, include_filters=None, exclude_filters=None):
+    """reserve the uncompressed size of the archive on the destination disk (only the files selected by the filters),
+    return the status given by probe_archive (None if admission control is disabled, "encrypted" as well when only
+    the entries are encrypted) and a Reservation if the extraction can start, None if the archive size is unknown or
+    admission control is disabled, False if the archive does not fit
+    """
+    if not settings["admission_control"]:
+        return None, None
+    listing, status = probe_archive(file, get_lister_path(z7path))
+    if listing is not None and listing.encrypted:
+        status = "encrypted"
+    if listing is None:
+        # encrypted headers or not an archive, the size is unknown so the extraction is not held
+        return status, None
+    size = listing.filtered_size(include_filters, exclude_filters)
+    reservation = AdmissionController.get_instance().admit(
+        f"{file}lv{lv:d}",
+        size,
+        margin=settings["admission_margin_mb"] * 1024 * 1024,
+        timeout=settings["admission_wait_seconds"],
+    )
+    if reservation is None:
+        return status, False
+    log_msg(f"Reserved {size / 1024 / 1024:.2f} MB for {file}", log_level=2)
+    return status, reservation
 
-    # List all files in the directory
-    all_files = os.listdir(dir_path)
 
-    # Compile regex to match all known multi-part formats related to the base name
-    patterns = [
-        re.escape(base) + r"\.part\d+\.rar$",  # part01.rar, part02.rar
-        re.escape(base) + r"\.rar$",  # base.rar (often first file)
-        re.escape(base) + r"\.r\d{2}$",  # r00, r01
-        re.escape(base) + r"\.z\d{2}$",  # z01, z02
-        re.escape(base) + r"\.\d{3}$",  # 001, 002
-        re.escape(base) + r"\.7z\.\d{3}$",  # 7z.001, 7z.002
-        re.escape(base) + r"\.zip$",  # base.zip
-    ]
+def release_extraction(reservation):
+    """release the space reserved by admit_extraction, the extracted files now show up in the disk usage"""
+    if reservation:
+        reservation.release()
 
-    # Match files to be deleted
-    matched_files = []
-    for pattern in patterns:
-        regex = re.compile(pattern, re.IGNORECASE)
-        matched_files += [f for f in all_files if regex.fullmatch(f)]
 
-    # Remove duplicates and sort
-    matched_files = sorted(set(matched_files))
+def find_volumes(file):
+    """find the volumes of the multi-part archive whose first volume is file, return the list of their names in
+    order (file alone for a single-volume archive) and whether the sequence has no gap"""
+    dir_path = os.path.dirname(file) or "."
+    file_name = os.path.basename(file)
+    for name_regex, volume_regex, first, principal in volume_schemes:
+        match = re.fullmatch(name_regex, file_name, flags=re.IGNORECASE)
+        if match is None:
+            continue
+        volume = re.compile(re.escape(match.group(1)) + volume_regex, flags=re.IGNORECASE)
+        numbers = {}
+        for name in os.listdir(dir_path):
+            volume_match = volume.fullmatch(name)
+            if volume_match:
+                numbers[int(volume_match.group(1))] = name
+        if not numbers or (len(numbers) == 1 and file_name in numbers.values()):
+            # no other volume, a later scheme may still apply (base.part1.rar is also a .rar)
+            continue
+        parts = [numbers[number] for number in sorted(numbers)]
+        if principal == "first":
+            parts = [file_name] + parts
+        elif principal == "last":
+            parts = parts + [file_name]
+        complete = sorted(numbers) == list(range(first, first + len(numbers)))
+        return parts, complete
+    # single-volume format (.7z, .tar.gz, .cab...)
+    return [file_name], True
+
+
+def archive_parts(file):
+    """Names of the files of an archive: the archive itself and the other volumes of its own multi-part scheme (see
+    find_volumes). Other archives with the same base name (abc.zip next to abc.7z) are not parts of it."""
+    return sorted(find_volumes(file)[0])
+
+
+def remove_archive(file, permanent=False):
+    """Remove archive files after unzipping, including all parts of multi-part archives.
+    The files go to the recycle bin unless permanent is True (the space is then freed at once)."""
+    dir_path = os.path.dirname(file)
+    matched_files = archive_parts(file)
 
     # Logging
     log_msg(f"Removing {len(matched_files)} archive part(s)", log_level=3)
 
     # Send all to recycle bin
-    for f in matched_files:
-        send2trash.send2trash(os.path.join(dir_path, f))
+    # send2trash is only imported when something is deleted, it is slow to import
+    import send2trash
 
+    with span("delete", file=file, parts=len(matched_files)):
+        for f in matched_files:
+            if permanent:
+                os.remove(os.path.join(dir_path, f))
+            else:
+                send2trash.send2trash(os.path.join(dir_path, f))
+
+
+def filter_switches(z7path, include_filters, exclude_filters):
+    """7z switches extracting only the files selected by the include / exclude glob filters, archives are always
+    included so that the next levels are still unzipped"""
+    if not include_filters and not exclude_filters:
+        return []
+    if is_bandizip(z7path):
+        log_msg("Include / exclude filters are only supported with 7z, extracting everything", log_level=4)
+        return []
+    switches = []
+    if include_filters:
+        switches += [f"-ir!{pattern}" for pattern in include_filters + archive_wildcards]
+    switches += [f"-xr!{pattern}" for pattern in exclude_filters]
+    return switches
+
+
+def reclaim_archive(file, lv, reclaimer, autodelete=False):
+    """apply the reclaim_intermediate policy to an archive whose extraction has just completed: "delete" sends it
+    with all its parts to the recycle bin, "delete_permanently" removes them at once (only below the top level),
+    "hardlink" replaces it by a hard link to an identical archive kept earlier, "off" keeps it.
+    Only the files named like archives are touched, the documents 7z can open (.docx, .jar, .iso...) are payload,
+    and they are deleted only if autodelete is True. Top-level archives are only touched if keep_top_level_archives
+    is False. reclaimer is the Reclaimer of the run."""
+    policy = settings["reclaim_intermediate"]
+    if policy == "off" or (lv == 0 and settings["keep_top_level_archives"]) or not os.path.exists(file):
+        return
+    if not is_archive_name(file):
+        return
+    if policy in ("delete", "delete_permanently"):
+        if not autodelete:
+            return
+        permanent = policy == "delete_permanently" and lv > 0
+        dir_path = os.path.dirname(file)
+        size = sum(os.path.getsize(os.path.join(dir_path, part)) for part in archive_parts(file))
+        remove_archive(file, permanent=permanent)
+        if permanent:
+            # the recycle bin is usually on the same disk, only the permanent deletion frees space
+            reclaimer.add_reclaimed(size)
+    elif policy == "hardlink":
+        reclaimer.add_reclaimed(reclaimer.hardlink_duplicate(file))
+    reclaimer.sample()
+
+
+def run_extractor(args, waiting_message, parts=1):
+    """run the extractor with args, print waiting_message if it takes more than 2 seconds, return the CompletedProcess
+    parts is the number of extractors working on the same archive (see extract_in_shards)"""
+    # the timer thread logs in the context of the caller (the library API gets the message as an event)
+    timer = threading.Timer(2, contextvars.copy_context().run, [log_msg, waiting_message])
+    timer.start()
+    try:
+        # within the thread budget and at the priority given by the settings
+        return run_governed(args, parts)
+    finally:
+        timer.cancel()
 
-# unzip a file
-def unzipFileWith7z(
-    file,
-    z7path,
-    passwords,
-    autodelete=False,
-    autodeleteexisting=False,
-    lv=0,
-    maximum_lv=2,
-):
-    """principle function, unzip a file with 7z.exe, return True if success, otherwise return False"""
-    has_archive = False
-    password_protected = False
 
+def sniff_file(file, lv, autodeleteexisting):
+    """checks done before calling the extractor, return True if the file must be skipped"""
     # check if the file exists
     if not os.path.exists(file):
         log_msg(f"File {file} does not exist", log_level=5)
-        return False, lv
+        return True
 
     # check if is a .lib, .dll or .exe file, if yes skip
     # TODO: maybe a temporary solution, need to find a way to unzip .lib files
     if file.endswith(".lib") or file.endswith(".dll") or file.endswith(".exe"):
         log_msg(f"File {file} is a .lib, .dll or .exe file, skipping...", log_level=5)
-        return False, lv
+        return True
 
     # check if is a multi-archive sub archives, if yes skip
     if re.search(multi_archive_regex, file):
@@ -161,7 +292,7 @@ def unzipFileWith7z(
             f"File {file} is a multi-archive non-principle part, skipping...",
             log_level=5,
         )
-        return False, lv
+        return True
 
     # check if the output directory already exists
     if os.path.exists(f"{file}lv{lv:d}"):
@@ -176,140 +307,361 @@ def unzipFileWith7z(
                 f"Output directory {file}lv{lv:d} already exists, skipping...",
                 log_level=4,
             )
-            return False, lv
+            return True
 
-    # unzip without password
     # verify file is a a os.PathLike
-    right_pass_found = False
     if not isinstance(file, os.PathLike) and not isinstance(file, str):
         raise TypeError(f"{file} must be a os.PathLike")
+    return False
+
+
+def emit(on_event, event):
+    """report event to the caller of the library API, if any"""
+    if on_event is not None:
+        on_event(event)
+
+
+def password_candidates(file, passwords, hints=None):
+    """passwords to try on a protected archive as (password, source) pairs, the ones that opened the parent archive
+    or a sibling first (see PasswordHints), then the ones contained in the file name, then the password list, each
+    password only once"""
+    candidates = []
+    seen = set()
+    hinted = hints.hints(file) if hints is not None else []
+    for password, source in hinted:
+        if password not in seen:
+            seen.add(password)
+            candidates.append((password, source))
+    for source, group in (("file_name", getPassInFileName(file)), ("list", passwords)):
+        for password in group:
+            if password not in seen:
+                seen.add(password)
+                candidates.append((password, source))
+    return candidates
+
+
+def password_found(file, lv, password, source, autodelete, on_event=None, hints=None):
+    """password (from source) opened file: delete the archive if autodelete is True, remember the password for the
+    archives likely to share it and report it"""
+    if autodelete:
+        # delete the original file if autodelete is True
+        remove_archive(file)
+    if hints is not None:
+        hints.record(file, lv, password)
+    emit(on_event, PasswordFound(file, lv, password, source))
+
+
+def extract_archive(
+    file, z7path, candidates, autodelete, lv, on_event=None, probe=True, switches=(), hints=None, encrypted=None
+):
+    """extract file to {file}lv{lv}, first without password (unless probe is False) then with the candidates
+    given by password_candidates, switches are added to every run of the extractor (see filter_switches),
+    the password that opens file is recorded in hints, return "ok", "no_password", "not_archive" or "error"
+    encrypted tells whether the listing of the archive showed encryption (None if it was not listed)
+    """
+    if probe:
+        # the extractor ignores the password of an archive that is not protected, so the first hint is given to the
+        # probe: a nested archive sharing the password of its parent is unzipped in one run instead of two
+        probe_password = None
+        probe_source = None
+        if candidates and candidates[0][1] in hint_sources and encrypted is not False:
+            probe_password, probe_source = candidates[0]
+            candidates = candidates[1:]
+        # unzip without password
+        log_msg(f"Unzipping {file} without password...", log_level=2)
+
+        with span("probe", file=file, level=lv, hint=probe_password is not None):
+            args = [z7path, "x", f"-o:{file}lv{lv:d}", file, *switches]
+            if probe_password is not None:
+                args.insert(2, f"-p{probe_password}")
+            result = run_extractor(args, "Unzipping is taking time, please wait...")
+
+        # when using 7z, if the file is not an archive, it will return 2 and the error message will contain "Cannot open the file as archive"
+        # when using bandizip, it will return 17 and the error message will contain "Unknown archive"
+        if is_not_archive(result):
+            if lv == 0:
+                log_msg(f'File "{file}" is not an archive', log_level=4)
+            # remove the empty directory due to file is not an archive
+            shutil.rmtree(f"{file}lv{lv:d}", ignore_errors=True)
+            return "not_archive"
+        if result.returncode == 0:
+            if probe_password is not None and encrypted:
+                log_msg(
+                    f"Correct password for {file} is {probe_password} (same as its {probe_source}), "
+                    f"unzipped to {file}lv{lv:d}",
+                    log_level=3,
+                )
+                password_found(file, lv, probe_password, probe_source, autodelete, on_event, hints)
+                return "ok"
+            if probe_password is not None:
+                # not listed, the archive may as well not be protected: the password is not taken as a hint
+                log_msg(
+                    f"Archive {file} is not password protected or its password is {probe_password} (hint), "
+                    f"unzipped to {file}lv{lv:d}",
+                    log_level=3,
+                )
+                return "ok"
+            log_msg(
+                f"Archive {file} is not password protected, unzipped to {file}lv{lv:d}",
+                log_level=3,
+            )
+            return "ok"
 
-    log_msg(f"Unzipping {file} without password...", log_level=2)
-
-    timer = threading.Timer(2, print, ["Unzipping is taking time, please wait..."])
-    timer.start()
-    args = [z7path, "x", f"-o:{file}lv{lv:d}", file]
-    result = subprocess.run(
-        args,
-        capture_output=True,
-        stdin=subprocess.DEVNULL,
-        check=False,
-    )
-    timer.cancel()
+        # when using 7z, if the file is password protected, it will return 2 and the error message will contain "Wrong password"
+        # when using bandizip, it will return 14 and the error message will contain "Wrong password"
+        if not is_wrong_password(result):
+            log_msg(f"Unknown error when unzipping {file}", log_level=5)
+            log_msg(result.stderr.decode("utf-8", errors="replace"), log_level=5)
+            return "error"
 
-    # when using 7z, if the file is password protected, it will return 2 and the error message will contain "Wrong password"
-    # when using bandizip, it will return 14 and the error message will contain "Wrong password"
-    if is_wrong_password(result):
         log_msg(
             f"Archive {file} is password protected, start to unzip with passwords...",
             log_level=2,
         )
         shutil.rmtree(f"{file}lv{lv:d}", ignore_errors=True)
-        has_archive = True
-        password_protected = True
 
-    # when using 7z, if the file is not an archive, it will return 2 and the error message will contain "Cannot open the file as archive"
-    # when using bandizip, it will return 17 and the error message will contain "Unknown archive"
-    if is_not_archive(result):
+    # unzip with password, the ones in the file name first
+    for attempt, (password, source) in enumerate(candidates):
+        with span("password", file=file, level=lv, attempt=attempt, source=source):
+            result = run_extractor(
+                [z7path, "x", f"-p{password}", file, f"-o{file}lv{lv:d}", *switches],
+                f"Unzipping is taking time (password is {password}), please wait...",
+            )
+        if is_wrong_password(result):
+            # remove empty files created due to wrong password
+            shutil.rmtree(f"{file}lv{lv:d}", ignore_errors=True)
+            continue
+
+        if source == "file_name":
+            log_msg(
+                f"Correct password for {file} is {password} (contained in file name), unzipped to {file}lv{lv:d}",
+                log_level=3,
+            )
+        elif source in hint_sources:
+            log_msg(
+                f"Correct password for {file} is {password} (same as its {source}), unzipped to {file}lv{lv:d}",
+                log_level=3,
+            )
+        else:
+            log_msg(
+                f"Correct password for {file} is {password}, unzipped to {file}lv{lv:d}",
+                log_level=3,
+            )
+        password_found(file, lv, password, source, autodelete, on_event, hints)
+        return "ok"
+
+    # no password found for the file
+    log_msg(f"Cannot find the correct password for {file}", log_level=5)
+    return "no_password"
+
+
+def extract_in_shards(file, z7path, lv, include_filters=None, exclude_filters=None):
+    """extract a big non-solid archive with several extractors at once, each one writing a byte-balanced shard of
+    the entries to {file}lv{lv}, return "ok", or None if the archive must be extracted by a single extractor
+    (parallel_extract_workers is 1, small, solid or encrypted archive, or a shard failed)"""
+    workers = settings["parallel_extract_workers"]
+    if workers <= 1 or is_bandizip(z7path) or os.path.getsize(file) < settings["parallel_extract_min_mb"] * 1024 * 1024:
+        return None
+    # answered by the metadata cache, the archive has just been listed by admit_extraction
+    listing = list_archive(file, get_lister_path(z7path))
+    if listing is None or listing.solid or listing.encrypted:
+        # a solid block has to be decoded from its start, the shards would all decode the same data
+        return None
+    if (listing.archive_type or "").lower() not in shardable_types:
+        return None
+    shards = listing.shards(workers, include_filters, exclude_filters)
+    if len(shards) <= 1:
+        return None
+
+    output_dir = f"{file}lv{lv:d}"
+    log_msg(f"Unzipping {file} with {len(shards):d} extractors at once...", log_level=3)
+    list_files = []
+    try:
+        for shard in shards:
+            fd, list_file = tempfile.mkstemp(prefix="mlu_shard_", suffix=".txt")
+            with os.fdopen(fd, "w", encoding="utf8") as f:
+                f.write("\n".join(entry["path"] for entry in shard))
+            list_files.append(list_file)
+
+        def extract_shard(index):
+            with span("shard", file=file, level=lv, shard=index, files=len(shards[index])):
+                # -spd: the names of the list file are paths, not wildcards
+                return run_extractor(
+                    [z7path, "x", f"-o{output_dir}", "-spd", "-scsUTF-8", file, f"@{list_files[index]}"],
+                    f"Unzipping shard {index + 1:d}/{len(shards):d} of {file} is taking time, please wait...",
+                    parts=len(shards),
+                )
+
+        results = list(map_jobs(extract_shard, range(len(shards)), len(shards)))
+    finally:
+        for list_file in list_files:
+            os.remove(list_file)
+
+    if any(result.returncode != 0 for result in results) or not verify_shards(output_dir, shards):
+        log_msg(f"Parallel unzipping of {file} failed, unzipping it with a single extractor", log_level=4)
+        shutil.rmtree(output_dir, ignore_errors=True)
+        return None
+    if not include_filters and not exclude_filters:
+        # the list files only name files, the empty directories of the archive are created here
+        for entry in listing.entries:
+            if entry["is_dir"]:
+                os.makedirs(os.path.join(output_dir, entry["path"]), exist_ok=True)
+    log_msg(f"Archive {file} is not password protected, unzipped to {output_dir}", log_level=3)
+    return "ok"
+
+
+def verify_shards(output_dir, shards):
+    """check that every file of the shards has been written to output_dir with the size given by the listing"""
+    for shard in shards:
+        for entry in shard:
+            try:
+                if os.path.getsize(os.path.join(output_dir, entry["path"])) != entry["size"]:
+                    return False
+            except OSError:
+                return False
+    return True
+
+
+# unzip a file
+def unzipFileWith7z(
+    file,
+    z7path,
+    passwords,
+    autodelete=False,
+    autodeleteexisting=False,
+    lv=0,
+    maximum_lv=2,
+    on_event=None,
+    include_filters=None,
+    exclude_filters=None,
+    hints=None,
+    reclaimer=None,
+):
+    """principle function, unzip a file with 7z.exe, return True if success, otherwise return False
+    on_event is called with the events of events.py as the extraction goes
+    include_filters / exclude_filters are lists of glob patterns selecting the files to extract (default: the
+    settings of the same name), archives are always extracted
+    hints is the PasswordHints of the run, shared by all the files of the run so that siblings reuse the passwords
+    found (a new one is made if None)
+    reclaimer is the Reclaimer of the run, tracking its disk usage (a new one, sampling nothing, is made if None)"""
+    if hints is None:
+        hints = PasswordHints()
+    if reclaimer is None:
+        reclaimer = Reclaimer()
+    if include_filters is None:
+        include_filters = settings["include_filters"]
+    if exclude_filters is None:
+        exclude_filters = settings["exclude_filters"]
+
+    with span("sniff", file=file, level=lv):
+        skip = sniff_file(file, lv, autodeleteexisting)
+    if skip:
+        return False, lv
+    emit(on_event, ArchiveStarted(file, lv))
+
+    candidates = password_candidates(file, passwords, hints)
+    probe = True
+    fingerprint = None
+    if settings["negative_cache"]:
+        fingerprint, tried = NegativeCache.get_instance().lookup(file)
+        if tried is not None:
+            # no password opened this archive in a previous run, only the passwords added since are tried
+            candidates = [candidate for candidate in candidates if password_digest(candidate[0]) not in tried]
+            if not candidates:
+                log_msg(f"No new password to try for {file} since the last failure, skipping...", log_level=4)
+                emit(on_event, ArchiveFinished(file, lv, False, "no_password"))
+                return False, lv
+            log_msg(f"Trying {len(candidates):d} new password(s) for {file}", log_level=3)
+            probe = False
+
+    # make sure the extracted files will fit on the disk before writing anything, an extractor that cannot filter
+    # (Bandizip) writes all the files
+    switches = filter_switches(z7path, include_filters, exclude_filters)
+    admitted_filters = (include_filters, exclude_filters) if switches else (None, None)
+    with span("list", file=file, level=lv):
+        listed, reservation = admit_extraction(file, z7path, lv, *admitted_filters)
+    if listed == "not_archive" and get_lister_path(z7path) == z7path:
+        # the extractor has just failed to open the file, it would fail the same way to extract it
         if lv == 0:
             log_msg(f'File "{file}" is not an archive', log_level=4)
-        # remove the empty directory due to file is not an archive
-        shutil.rmtree(f"{file}lv{lv:d}", ignore_errors=True)
+        emit(on_event, ArchiveFinished(file, lv, False, "not_archive"))
         return False, lv
-    if result.returncode == 0:
-        log_msg(
-            f"Archive {file} is not password protected, unzipped to {file}lv{lv:d}",
-            log_level=3,
-        )
-        right_pass_found = True
-        has_archive = True
-    elif password_protected is False:
-        log_msg(f"Unknown error when unzipping {file}", log_level=5)
-        log_msg(result.stderr.decode("utf-8", errors="replace"), log_level=5)
+    if reservation is False:
+        log_msg(f"Not enough disk space to unzip {file}, skipping...", log_level=5)
+        emit(on_event, ArchiveFinished(file, lv, False, "no_space"))
         return False, lv
 
-    # try to unzip with password in file name
-    if password_protected and not right_pass_found:
-        passwords_in_file = getPassInFileName(file)
-        # add these passwords to be begining of the passwords list
-        if passwords_in_file is not None:
-            passwords = passwords_in_file + passwords
-            for password in passwords_in_file:
-                timer = threading.Timer(
-                    2,
-                    print,
-                    [f"Unzipping is taking time (password is {password}), please wait..."],
-                )
-                timer.start()
-                result = subprocess.run(
-                    [z7path, "x", f"-p{password}", file, f"-o{file}lv{lv:d}"],
-                    capture_output=True,
-                    stdin=subprocess.DEVNULL,
-                    check=False,
-                )
-                timer.cancel()
-                if is_wrong_password(result):
-                    # remove empty files created due to wrong password
-                    shutil.rmtree(f"{file}lv{lv:d}", ignore_errors=True)
-                else:
-                    log_msg(
-                        f"Correct password for {file} is {password} (contained in file name), unzipped to {file}lv{lv:d}",
-                        log_level=3,
+    with span("extract", file=file, level=lv, packed_bytes=os.path.getsize(file)) as trace_args:
+        try:
+            status = None
+            if settings["fused_tarballs"]:
+                # compressed tarballs are decompressed and untarred in one pass, as a single level
+                with ResourceGovernor.get_instance().threads():
+                    status = extract_tarball(
+                        file,
+                        f"{file}lv{lv:d}",
+                        lambda name: matches_filters(name, include_filters, exclude_filters),
                     )
-                    has_archive = True
-                    right_pass_found = True
-                    break
-
-    # unzip with password
-    if password_protected and not right_pass_found:
-        for password in passwords:
-            timer = threading.Timer(
-                2,
-                print,
-                [f"Unzipping is taking time (password is {password}), please wait..."],
-            )
-            timer.start()
-            result = subprocess.run(
-                [z7path, "x", f"-p{password}", file, f"-o{file}lv{lv:d}"],
-                capture_output=True,
-                stdin=subprocess.DEVNULL,
-                check=False,
-            )
-            timer.cancel()
-            if is_wrong_password(result):
-                # remove empty files created due to wrong password
-                shutil.rmtree(f"{file}lv{lv:d}", ignore_errors=True)
-            else:
-                log_msg(
-                    f"Correct password for {file} is {password}, unzipped to {file}lv{lv:d}",
-                    log_level=3,
+            if status is None and probe:
+                # big non-solid archives are split between several extractors
+                status = extract_in_shards(file, z7path, lv, include_filters, exclude_filters)
+            if status is None:
+                status = extract_archive(
+                    file,
+                    z7path,
+                    candidates,
+                    autodelete,
+                    lv,
+                    on_event,
+                    probe,
+                    switches,
+                    hints,
+                    encrypted=listed == "encrypted" if listed in ("ok", "encrypted") else None,
                 )
-                has_archive = True
-                right_pass_found = True
-                if autodelete:
-                    # delete the original file if autodelete is True
-                    remove_archive(file)
-
-                break
-
-    # no password found for the file
-    if not right_pass_found:
-        log_msg(f"Cannot find the correct password for {file}", log_level=5)
+        finally:
+            release_extraction(reservation)
+        trace_args["status"] = status
+        if reservation:
+            trace_args["bytes"] = reservation.nbytes
+    if status == "no_password" and settings["negative_cache"]:
+        NegativeCache.get_instance().record_failure(file, [password for password, source in candidates], fingerprint)
+    elif status == "ok" and fingerprint is not None:
+        NegativeCache.get_instance().forget(fingerprint)
+    emit(
+        on_event,
+        ArchiveFinished(
+            file,
+            lv,
+            status == "ok",
+            status,
+            output_dir=f"{file}lv{lv:d}" if status == "ok" else None,
+            bytes=reservation.nbytes if reservation else None,
+        ),
+    )
+    if status != "ok":
         return False, lv
 
+    # the peak disk usage is reached now, with both the archive and its content on the disk
+    reclaimer.sample()
+    reclaim_archive(file, lv, reclaimer, autodelete)
+
     # trying to unzip the files in the directory just created
-    if has_archive:
-        # check if is the last level
-        if check_if_is_last_level(f"{file}lv{lv:d}"):
-            # the file just unzipped is the final level
-            return False, lv
+    # check if is the last level
+    with span("classify", file=file, level=lv) as trace_args:
+        is_last_level = check_if_is_last_level(f"{file}lv{lv:d}")
+        trace_args["last_level"] = is_last_level
+    emit(on_event, LevelReached(file, lv, f"{file}lv{lv:d}", is_last_level))
+    if is_last_level:
+        # the file just unzipped is the final level
+        return False, lv
 
-        log_msg(
-            f"Archive {file} has been unzipped to {file}lv{lv:d}, going to next level",
-            log_level=3,
-        )
-        lv += 1
-        # recursively unzip the files in the directory just created
+    log_msg(
+        f"Archive {file} has been unzipped to {file}lv{lv:d}, going to next level",
+        log_level=3,
+    )
+    lv += 1
+    # recursively unzip the files in the directory just created
+    with span("recurse", file=file, level=lv):
         for root, dirs, files in os.walk(f"{file}lv{lv-1:d}"):
             for file in files:
                 unzipFileWith7z(
@@ -319,9 +671,67 @@ def unzipFileWith7z(
                     autodelete,
                     autodeleteexisting,
                     lv,
+                    on_event=on_event,
+                    include_filters=include_filters,
+                    exclude_filters=exclude_filters,
+                    hints=hints,
+                    reclaimer=reclaimer,
                 )
-        return True, lv
-    return False, lv
+    return True, lv
+
+
+def list_target_files(target, unzipsubfolder=None):
+    """files of target to hand to unzipFileWith7z: target itself if it is a file, otherwise the files directly under
+    target, or all files under target if unzipsubfolder (default: the unzipsubfolder setting)"""
+    if os.path.isfile(target):
+        return [target]
+    if unzipsubfolder is None:
+        unzipsubfolder = settings["unzipsubfolder"]
+    if not unzipsubfolder:
+        return [os.path.join(target, file) for file in os.listdir(target) if os.path.isfile(os.path.join(target, file))]
+    return [os.path.join(root, file) for root, dirs, files in os.walk(target) for file in files]
+
+
+def map_jobs(function, items, workers):
+    """apply function to all items, in parallel if workers > 1, results are yielded in the order of items"""
+    if workers <= 1:
+        yield from map(function, items)
+        return
+    # the thread pool is only imported by parallel runs, it pulls in logging
+    from concurrent.futures import ThreadPoolExecutor
+
+    # the jobs run in the context of the caller (log handler of the library API), each one in its own copy
+    context = contextvars.copy_context()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(lambda item: context.copy().run(function, item), items)
+
+
+def average_job_bytes(files, z7path):
+    """average space needed to unzip one of the archives among files: their uncompressed size, from the listings the
+    metadata cache keeps for the extraction, or their packed size when the metadata cache is off"""
+    sizes = []
+    for file in files:
+        if sniff_signature(file) is None and not is_archive_name(file):
+            # not an archive, it takes no space
+            continue
+        if not settings["metadata_cache"]:
+            sizes.append(os.path.getsize(file))
+            continue
+        listing = list_archive(file, get_lister_path(z7path))
+        if listing is not None:
+            sizes.append(listing.uncompressed_size)
+    return sum(sizes) // max(len(sizes), 1)
+
+
+def parallel_jobs(target, files, z7path, max_jobs):
+    """number of the files of target to unzip at once: max_jobs, or if it is 0 as many as the cpu count and the free
+    space allow (see average_job_bytes), the thread budget is split between them"""
+    workers = max_jobs
+    if workers != 1:
+        workers = AdmissionController.get_instance().job_slots(target, average_job_bytes(files, z7path), workers)
+        log_msg(f"Unzipping up to {workers:d} archives at once", log_level=3)
+    ResourceGovernor.get_instance().set_jobs(workers)
+    return workers
 
 
 def move_files_up(dir_path):
@@ -335,8 +745,10 @@ def move_files_up(dir_path):
     if len(contents) == 1 and os.path.isdir(os.path.join(dir_path, contents[0])):
         subdir_path = os.path.join(dir_path, contents[0])
         if os.path.isdir(subdir_path):
-            subdir_contents = os.listdir(subdir_path)
-            for item in subdir_contents:
-                shutil.move(os.path.join(subdir_path, item), dir_path)
-            os.rmdir(subdir_path)
+            with span("flatten", dir=dir_path) as trace_args:
+                subdir_contents = os.listdir(subdir_path)
+                for item in subdir_contents:
+                    shutil.move(os.path.join(subdir_path, item), dir_path)
+                os.rmdir(subdir_path)
+                trace_args["items"] = len(subdir_contents)
             move_files_up(dir_path)